@@ -20,20 +20,33 @@ log = logging.getLogger(__name__)  # Start logging
 
 import os
 import base64
+import ctypes
+import hashlib
 import salt.utils
-import string
-import binascii
 import salt.exceptions
 
+# CommonCrypto constants from CommonKeyDerivation.h
+kCCPBKDF2 = 2
+kCCPRFHmacAlgSHA512 = 5
+
 try:
-    from passlib.utils import pbkdf2, ab64_encode, ab64_decode
-    HAS_PASSLIB = True
-except ImportError:
-    HAS_PASSLIB = False
+    _libcommoncrypto = ctypes.CDLL('/usr/lib/system/libcommonCrypto.dylib')
+    _CCKeyDerivationPBKDF = _libcommoncrypto.CCKeyDerivationPBKDF
+    _CCKeyDerivationPBKDF.restype = ctypes.c_int
+    _CCKeyDerivationPBKDF.argtypes = [
+        ctypes.c_uint32,  # algorithm
+        ctypes.c_char_p, ctypes.c_size_t,  # password
+        ctypes.c_char_p, ctypes.c_size_t,  # salt
+        ctypes.c_uint32,  # prf
+        ctypes.c_uint,  # rounds
+        ctypes.c_void_p, ctypes.c_size_t,  # derived key
+    ]
+except (OSError, AttributeError):
+    _CCKeyDerivationPBKDF = None
 
 
 def __virtual__():
-    if HAS_PASSLIB and salt.utils.platform.is_darwin():
+    if salt.utils.platform.is_darwin():
         return True
     else:
         return False
@@ -43,7 +56,8 @@ def _pl_salted_sha512_pbkdf2_from_string(strvalue, salt_bin=None, iterations=100
     '''
     Create a PBKDF2-SHA512 hash with a 128 byte key length.
     The standard passlib.hash.pbkdf2_sha512 functions assume a 64 byte key length which does not match OSX's
-    implementation.
+    implementation, so CommonCrypto's PBKDF2 is used with an explicit key length instead, or hashlib's if CommonCrypto
+    is not available.
 
     :param strvalue: The string to derive the hash from
     :param salt: The (randomly generated) salt
@@ -53,9 +67,20 @@ def _pl_salted_sha512_pbkdf2_from_string(strvalue, salt_bin=None, iterations=100
     if salt_bin is None:
         salt_bin = os.urandom(32)
 
+    if not isinstance(strvalue, bytes):
+        strvalue = strvalue.encode('utf-8')
+
     key_length = 128
-    hmac_sha512, dsize = pbkdf2.get_prf("hmac-sha512")
-    digest_bin = pbkdf2.pbkdf2(strvalue, salt_bin, iterations, key_length, hmac_sha512)
+    if _CCKeyDerivationPBKDF is not None:
+        derived_key = ctypes.create_string_buffer(key_length)
+        status = _CCKeyDerivationPBKDF(kCCPBKDF2, strvalue, len(strvalue), salt_bin, len(salt_bin),
+                                       kCCPRFHmacAlgSHA512, iterations, derived_key, key_length)
+        if status == 0:
+            return derived_key.raw, salt_bin, iterations
+
+        log.debug('CCKeyDerivationPBKDF failed with status {0}, using hashlib'.format(status))
+
+    digest_bin = hashlib.pbkdf2_hmac('sha512', strvalue, salt_bin, iterations, key_length)
 
     return digest_bin, salt_bin, iterations
 
@@ -70,7 +95,7 @@ def _extract_authdata(item):
     returns
         version (default 1.0.0), tag, data as a tuple
     '''
-    parts = string.split(item, ';', 2)
+    parts = item.split(';', 2)
 
     if not parts[0]:
         parts[0] = '1.0.0'
@@ -127,8 +152,8 @@ def user_shadowhash(name):
         )
 
 
-    plist_hex = string.replace(data['dsAttrTypeNative:ShadowHashData'], ' ', '')
-    plist_bin = binascii.unhexlify(plist_hex)
+    # bytes.fromhex skips the whitespace between the hex digit groups itself.
+    plist_bin = bytes.fromhex(data['dsAttrTypeNative:ShadowHashData'])
 
     # plistlib is not used, because mavericks ships without binary plist support from plistlib.
     plist = __salt__['plist.parse_string'](plist_bin)
@@ -206,13 +231,13 @@ def gen_password(password, salt=None, iterations=None):
     if salt is None:
         salt_bin = os.urandom(32)
     else:
-        salt_bin = base64.b64decode(salt, '+/')
+        salt_bin = base64.b64decode(salt)
 
     entropy, used_salt, used_iterations = _pl_salted_sha512_pbkdf2_from_string(password, salt_bin, iterations)
 
     result = {
-        'entropy': base64.b64encode(entropy, '+/'),
-        'salt': base64.b64encode(used_salt, '+/'),
+        'entropy': base64.b64encode(entropy),
+        'salt': base64.b64encode(used_salt),
         'iterations': used_iterations
     }
 
@@ -252,7 +277,7 @@ def set_password_hash(name, hashtype, hash, salt=None, iterations=None):
     #     log.debug('Entropy IS EQUAL!')
 
     shd_bplist = __salt__['plist.gen_string'](shd, 'binary')
-    shd_bplist_b64 = base64.b64encode(shd_bplist, '+/')
+    shd_bplist_b64 = base64.b64encode(shd_bplist)
 
     log.debug('Flushing directory services cache')
     __salt__['dscl.flushcache']()
@@ -340,7 +340,7 @@ def load(name, persist=False):
 
         salt '*' launchd.load <path> [persist]
     '''
-    job_dict = __salt__['plist.read'](name)  # Gets a native NSCFDictionary
+    job_dict = __salt__['plist.read'](name)
 
     try:
 
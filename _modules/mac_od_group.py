@@ -18,13 +18,15 @@ has_imports = False
 
 __virtualname__ = 'group'
 
+# ODSession.defaultSession(), fetched once per process by _get_session
+_SESSION = None
+
 try:
     import objc
     from OpenDirectory import ODSession, ODQuery, ODNode, \
-        kODRecordTypeUsers, kODRecordTypeGroups, kODAttributeTypeRecordName, kODMatchContains, \
+        kODRecordTypeUsers, kODRecordTypeGroups, kODAttributeTypeRecordName, \
         kODAttributeTypeStandardOnly, kODMatchEqualTo, kODAttributeTypeUniqueID, kODMatchAny, \
         kODAttributeTypeAllTypes, kODAttributeTypePrimaryGroupID, kODAttributeTypeFullName
-    from Foundation import NSRunLoop, NSDefaultRunLoopMode, NSObject, NSDate
     has_imports = True
 except ImportError:
     pass
@@ -39,11 +41,22 @@ def __virtual__():
     else:
         return __virtualname__
 
+def _get_session():
+    '''
+    Get the shared ODSession, fetching it from OpenDirectory on first use.
+    '''
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = ODSession.defaultSession()
+
+    return _SESSION
+
+
 def _get_node(path):
     '''
     Get a reference to an ODNode instance given a path string eg. /LDAPv3/127.0.0.1
     '''
-    session = ODSession.defaultSession()
+    session = _get_session()
     node, err = ODNode.nodeWithSession_name_error_(session, path, None)
 
     if err:
@@ -340,7 +353,7 @@ def nodes():
 
         salt '*' opendirectory.nodes
     '''
-    session = ODSession.defaultSession()
+    session = _get_session()
     names, err = session.nodeNamesAndReturnError_(None)
 
     if err is not None:
@@ -19,14 +19,13 @@ has_imports = False
 
 __virtualname__ = 'shadow'
 
+# ODSession.defaultSession(), fetched once per process by _get_session
+_SESSION = None
+
 try:
     import objc
     from OpenDirectory import ODSession, ODQuery, ODNode, \
-        kODRecordTypeUsers, kODRecordTypeGroups, kODAttributeTypeRecordName, kODMatchContains, \
-        kODAttributeTypeStandardOnly, kODMatchEqualTo, kODMatchAny, \
-        kODAttributeTypeAllTypes, kODAttributeTypeUniqueID, kODAttributeTypePrimaryGroupID, kODAttributeTypeNFSHomeDirectory, \
-        kODAttributeTypeUserShell, kODAttributeTypeFullName, kODAttributeTypeGUID, kODAttributeTypeRecordName
-    from Foundation import NSRunLoop, NSDefaultRunLoopMode, NSObject, NSDate
+        kODRecordTypeUsers, kODAttributeTypeRecordName, kODAttributeTypeStandardOnly, kODMatchEqualTo
     has_imports = True
 except ImportError:
     pass
@@ -158,11 +157,22 @@ def set_password(name, password):
     return didChange
 
 
+def _get_session():
+    '''
+    Get the shared ODSession, fetching it from OpenDirectory on first use.
+    '''
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = ODSession.defaultSession()
+
+    return _SESSION
+
+
 def _get_node(path):
     '''
     Get a reference to an ODNode instance given a path string eg. /LDAPv3/127.0.0.1
     '''
-    session = ODSession.defaultSession()
+    session = _get_session()
     node, err = ODNode.nodeWithSession_name_error_(session, path, None)
 
     if err:
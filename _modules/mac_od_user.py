@@ -10,6 +10,8 @@ Support for local user manipulation via the DirectoryServices framework
 
 from __future__ import absolute_import
 import logging
+import time
+from itertools import chain
 from salt.exceptions import CommandExecutionError, SaltInvocationError
 import salt.utils
 
@@ -18,14 +20,30 @@ has_imports = False
 
 __virtualname__ = 'user'
 
+# ODSession.defaultSession(), fetched once per process by _get_session
+_SESSION = None
+
+# Number of seconds a cached getent result is considered fresh
+_GETENT_TTL = 60
+
 try:
     import objc
     from OpenDirectory import ODSession, ODQuery, ODNode, \
-        kODRecordTypeUsers, kODRecordTypeGroups, kODAttributeTypeRecordName, kODMatchContains, \
-        kODAttributeTypeStandardOnly, kODMatchEqualTo, kODMatchAny, \
+        kODRecordTypeUsers, kODAttributeTypeRecordName, kODMatchEqualTo, kODMatchAny, \
         kODAttributeTypeAllTypes, kODAttributeTypeUniqueID, kODAttributeTypePrimaryGroupID, kODAttributeTypeNFSHomeDirectory, \
-        kODAttributeTypeUserShell, kODAttributeTypeFullName, kODAttributeTypeGUID, kODAttributeTypeRecordName
-    from Foundation import NSRunLoop, NSDefaultRunLoopMode, NSObject, NSDate
+        kODAttributeTypeUserShell, kODAttributeTypeFullName, kODAttributeTypeGUID
+
+    # Attributes requested up front by getent(), so that each result record is already populated
+    # when the query returns instead of needing a separate fetch per record.
+    _GETENT_ATTRIBUTES = [
+        kODAttributeTypeRecordName,
+        kODAttributeTypeUniqueID,
+        kODAttributeTypePrimaryGroupID,
+        kODAttributeTypeNFSHomeDirectory,
+        kODAttributeTypeUserShell,
+        kODAttributeTypeFullName,
+        kODAttributeTypeGUID,
+    ]
     has_imports = True
 except ImportError:
     pass
@@ -96,6 +114,8 @@ def add(name,
             'unable to create local directory user, reason: {}'.format(err.localizedDescription())
         )
 
+    _invalidate_getent()
+
     for k, v in setattrs.items():
         setted, err = record.setValue_forAttribute_error_(v, k, None)
         if err is not None:
@@ -165,6 +185,8 @@ def delete(name, remove=False, force=False):
         __salt__['file.remove'](user[kODAttributeTypeNFSHomeDirectory])
 
     deleted, err = user.deleteRecordAndReturnError_(None)
+    _invalidate_getent()
+    _forget_user(name)
     if err:
         raise CommandExecutionError(
             'Unable to delete the user, reason: {}'.format(err.localizedDescription())
@@ -177,29 +199,52 @@ def _format_info(data):
     '''
     Return formatted information in a pretty way.
     '''
-    attrs = {}
-
-    for k, v in data.iteritems():
-        attrs[k] = list(v)
-
     # TODO: Normalise OD attributes into unix compatible results
 
-    return attrs
+    return {k: list(v) for k, v in data.items()}
 
 
-def getent(refresh=False):
+def getent(refresh=False, fields=None):
     '''
     Return info on all users
 
+    fields
+        Only retrieve these attributes (kODAttributeType* names) for each user. Partial results are not cached.
+
     CLI Example:
 
     .. code-block:: bash
 
         salt '*' group.getent
+        salt '*' user.getent fields='[dsAttrTypeStandard:RecordName, dsAttrTypeStandard:UniqueID]'
     '''
-    if 'user.getent' in __context__ and not refresh:
+    if fields is not None:
+        if isinstance(fields, str):
+            fields = [fields]
+        return _query_users(list(fields))[1]
+
+    if not refresh and _getent_is_fresh():
         return __context__['user.getent']
 
+    records, users = _query_users(_GETENT_ATTRIBUTES)
+
+    __context__['user.getent'] = users
+    __context__['user.getent.records'] = {
+        name: record for record, attrs in zip(records, users) for name in attrs.get(kODAttributeTypeRecordName, [])
+    }
+    __context__['user.getent.users'] = {
+        name: attrs for attrs in users for name in attrs.get(kODAttributeTypeRecordName, [])
+    }
+    __context__['user.getent.time'] = time.time()
+
+    return users
+
+
+def _query_users(attributes):
+    '''
+    Query all local users, returning a tuple of the records and their formatted attributes.
+    Only the given attributes are transferred by the query.
+    '''
     node = _get_node('/Local/Default')
     query, err = ODQuery.alloc().initWithNode_forRecordTypes_attribute_matchType_queryValues_returnAttributes_maximumResults_error_(
         node,
@@ -207,8 +252,8 @@ def getent(refresh=False):
         kODAttributeTypeAllTypes,
         kODMatchAny,
         None,
-        kODAttributeTypeStandardOnly,
-        200,  # TODO: hard coded limit bad
+        attributes,
+        0,  # No limit
         None
     )
 
@@ -217,19 +262,22 @@ def getent(refresh=False):
             'Failed to construct query: {}'.format(err)
         )
 
-    results, err = query.resultsAllowingPartial_error_(False, None)
+    # Everything ends up in one list, so wait for the complete result rather than collecting partial pages.
+    records, err = query.resultsAllowingPartial_error_(False, None)
 
     if err:
         raise SaltInvocationError(
             'Failed to query opendirectory: {}'.format(err)
         )
 
-    userAttrs = []
-    for result in results:
-        attrs, err = result.recordDetailsForAttributes_error_(None, None)
-        userAttrs.append(attrs)
+    records = records or []
+
+    # The attributes were requested by the query, so this only reads back what is already cached on each record.
+    # This is deliberately not spread across threads, the OpenDirectory/CoreFoundation API is not thread safe
+    # inside the minion (see README).
+    users = [_format_info(record.recordDetailsForAttributes_error_(attributes, None)[0]) for record in records]
 
-    return [_format_info(attrs) for attrs in userAttrs]
+    return records, users
 
 
 def chuid(name, uid):
@@ -261,7 +309,7 @@ def chgid(name, gid):
     if not isinstance(gid, int):
         raise SaltInvocationError('gid must be an integer')
 
-    return _update_attribute(name, kODAttributeTypePrimaryGroupID, uid)
+    return _update_attribute(name, kODAttributeTypePrimaryGroupID, gid)
 
 
 def chshell(name, shell):
@@ -274,7 +322,10 @@ def chshell(name, shell):
 
         salt '*' user.chshell foo /bin/zsh
     '''
-    return _update_attribute(name, kODAttributeTypeUserShell, uid)
+    if not isinstance(shell, str):
+        raise SaltInvocationError('shell must be a string')
+
+    return _update_attribute(name, kODAttributeTypeUserShell, shell)
 
 
 def chhome(name, home, **kwargs):
@@ -349,11 +400,69 @@ def primary_group(name):
 
         salt '*' user.primary_group saltadmin
     '''
-    user = info(name)
-    if user is None:
-        return None
+    if _getent_is_fresh() and name in __context__['user.getent.users']:
+        return __context__['user.getent.users'][name].get(kODAttributeTypePrimaryGroupID)
+
+    # Only fetch the primary group rather than every attribute via info()
+    return primary_groups([name]).get(name)
+
+
+def primary_groups(names):
+    '''
+    Return the primary groups of several users at once, as a dict of user name to primary group.
+    Users that cannot be found are omitted.
 
-    return user.get(kODAttributeTypePrimaryGroupID)
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' user.primary_groups '[saltadmin, root]'
+        salt '*' user.primary_groups root
+    '''
+    # A single user name given on the CLI arrives as a plain string
+    if isinstance(names, str):
+        names = [names]
+
+    if _getent_is_fresh():
+        cached = __context__['user.getent.users']
+        if all(name in cached for name in names):
+            return {name: cached[name].get(kODAttributeTypePrimaryGroupID) for name in names}
+
+    node = _get_node('/Search')
+    attributes = [kODAttributeTypeRecordName, kODAttributeTypePrimaryGroupID]
+
+    # A list of query values matches any one of them, so every user is found by a single query.
+    query, err = ODQuery.alloc().initWithNode_forRecordTypes_attribute_matchType_queryValues_returnAttributes_maximumResults_error_(
+        node,
+        kODRecordTypeUsers,
+        kODAttributeTypeRecordName,
+        kODMatchEqualTo,
+        list(names),
+        attributes,
+        0,
+        None
+    )
+
+    if err:
+        raise SaltInvocationError(
+            'Failed to construct query: {}'.format(err)
+        )
+
+    results, err = query.resultsAllowingPartial_error_(False, None)
+
+    if err:
+        raise SaltInvocationError(
+            'Failed to query opendirectory: {}'.format(err)
+        )
+
+    groups = {}
+    for result in results or []:
+        attrs = _format_info(result.recordDetailsForAttributes_error_(attributes, None)[0])
+        for name in attrs.get(kODAttributeTypeRecordName, []):
+            if name in names:
+                groups[name] = attrs.get(kODAttributeTypePrimaryGroupID)
+
+    return groups
 
 # def list_groups(name):
 #     '''
@@ -389,15 +498,9 @@ def list_users():
     if users is None:
         return None
 
-    # NOTE: did not use a list comprehension because each user record can actually have multiple usernames
+    # NOTE: each user record can actually have multiple usernames
     # this means that the system can resolve two distinct usernames as one account.
-    usernames = []
-    for user in users:
-        names = user[kODAttributeTypeRecordName]
-        for name in names:
-            usernames.append(name)
-
-    return usernames
+    return list(chain.from_iterable(user[kODAttributeTypeRecordName] for user in users))
 
 
 def rename(name, new_name):
@@ -410,7 +513,10 @@ def rename(name, new_name):
 
         salt '*' user.rename name new_name
     '''
-    return _update_attribute(name, kODAttributeTypeRecordName, new_name)
+    renamed = _update_attribute(name, kODAttributeTypeRecordName, new_name)
+    _forget_user(name)
+
+    return renamed
 
 
 def _update_attribute(name, od_attribute, value, commit=True):
@@ -427,6 +533,8 @@ def _update_attribute(name, od_attribute, value, commit=True):
             'user {} does not exist'.format(name)
         )
 
+    _invalidate_getent()
+
     didSet, err = user.setValue_forAttribute_error_(value, od_attribute, None)
     if err is not None:
         log.error('failed to set attribute {} on user {}, reason: {}'.format(od_attribute, name, err.localizedDescription()))
@@ -443,11 +551,22 @@ def _update_attribute(name, od_attribute, value, commit=True):
     return True
 
 
+def _get_session():
+    '''
+    Get the shared ODSession, fetching it from OpenDirectory on first use.
+    '''
+    global _SESSION
+    if _SESSION is None:
+        _SESSION = ODSession.defaultSession()
+
+    return _SESSION
+
+
 def _get_node(path):
     '''
     Get a reference to an ODNode instance given a path string eg. /LDAPv3/127.0.0.1
     '''
-    session = ODSession.defaultSession()
+    session = _get_session()
     node, err = ODNode.nodeWithSession_name_error_(session, path, None)
 
     if err:
@@ -458,10 +577,48 @@ def _get_node(path):
     return node
 
 
+def _getent_is_fresh():
+    '''
+    Determine whether a getent result is cached in the context and younger than _GETENT_TTL seconds.
+    '''
+    if 'user.getent' not in __context__:
+        return False
+
+    return time.time() - __context__.get('user.getent.time', 0) < _GETENT_TTL
+
+
+def _invalidate_getent():
+    '''
+    Discard the cached getent result, for use after the local directory has been modified.
+    '''
+    for key in ('user.getent', 'user.getent.records', 'user.getent.users', 'user.getent.time'):
+        __context__.pop(key, None)
+
+
+def _forget_user(userName):
+    '''
+    Drop any cached records for the given username, for use after the record has been deleted or renamed.
+    '''
+    records = __context__.get('user.records', {})
+    for key in [key for key in records if key[1] == userName]:
+        del records[key]
+
+
 def _find_user(path, userName):
     '''
     Find a user object in the local directory by their username.
     '''
+    if _getent_is_fresh():
+        # The local node is searched first, so a cached local record also answers a /Search lookup.
+        record = __context__['user.getent.records'].get(userName)
+        if record is not None or path == '/Local/Default':
+            return record
+
+    # Records found by earlier lookups are kept so that repeated attribute changes to one user only query once.
+    records = __context__.setdefault('user.records', {})
+    if (path, userName) in records:
+        return records[(path, userName)]
+
     node = _get_node(path)
 
     if not node:
@@ -469,36 +626,20 @@ def _find_user(path, userName):
             'directory services query not possible, cannot get reference to node at path: {}'.format(path)
         )
 
-    query, err = ODQuery.alloc().initWithNode_forRecordTypes_attribute_matchType_queryValues_returnAttributes_maximumResults_error_(
-        node,
+    record, err = node.recordWithRecordType_name_attributes_error_(
         kODRecordTypeUsers,
-        kODAttributeTypeRecordName,
-        kODMatchEqualTo,
         userName,
-        kODAttributeTypeStandardOnly,
-        1,
+        None,
         None
     )
 
-    if err:
-        raise SaltInvocationError(
-            'Failed to construct query: {}'.format(err)
-        )
-
-    results, err = query.resultsAllowingPartial_error_(False, None)
-
-    if err:
-        raise SaltInvocationError(
-            'Failed to query opendirectory: {}'.format(err)
-        )
-
-    if results is None or len(results) == 0:
+    if record is None:
+        # A missing record may also be reported as an error, so neither is treated as fatal.
+        if err is not None:
+            log.debug('failed to find user {} at {}, reason: {}'.format(userName, path, err.localizedDescription()))
         return None
 
-    if len(results) > 1:
-        raise CommandExecutionError(
-            'Expected user name {} to match only a single user, matched: {} result(s)'.format(userName, len(user))
-        )
+    records[(path, userName)] = record
 
-    return results[0]
+    return record
 
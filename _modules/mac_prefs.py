@@ -10,6 +10,7 @@ This module has some caveats.
 path, if that fails it will try to use the system PyObjC that ships with macOS.
 '''
 # py libs
+import contextlib
 import logging
 import sys
 import os
@@ -39,6 +40,26 @@ __func_alias__ = {
     'list_': 'list',
 }
 
+# (domain, user, host, runas) combinations written to since the last flush.
+_DIRTY_DOMAINS = set()
+
+# Types returned by CFPreferences that need no conversion.
+_SCALAR_TYPES = (bool, int, float, str, bytes)
+
+# uids of runas users that have already been looked up, by short name.
+_UID_CACHE = {}
+
+# Accepted values of the "user" and "host" parameters.
+_USER_MAP = {
+    'any': Foundation.kCFPreferencesAnyUser,
+    'current': Foundation.kCFPreferencesCurrentUser,
+}
+_HOST_MAP = {
+    'any': Foundation.kCFPreferencesAnyHost,
+    'current': Foundation.kCFPreferencesCurrentHost,
+}
+
+
 def __virtual__():
     if salt.utils.platform.is_darwin():
         return __virtualname__
@@ -57,70 +78,118 @@ def _convert_pyobjc_objects(pref):
                   'converting "{}" NSDate to string...'.format(pref))
         return str(pref)
 
+    # PyObjC already bridges scalars (NSString, NSNumber) to subclasses of the
+    # native python types, only collections need to be walked and rebuilt.
+    if pref is None or isinstance(pref, _SCALAR_TYPES):
+        return pref
+
     return Conversion.pythonCollectionFromPropertyList(pref)
 
 
+def _pref_equals(pref, value):
+    '''
+    Compare a value as returned by CFPreferences against a python value
+    without converting the whole preference to python objects first.
+    '''
+    if isinstance(pref, (Foundation.NSArray, Foundation.NSDictionary)):
+        return bool(pref.isEqual_(value))
+
+    return pref == value
+
+
 def _get_user_and_host(user, host):
     '''
     returns a tuple of kCFPreferences(Any/Current)User and
     kCFPreferences(Any/Current)Host.
     '''
-    if user.lower() == 'any':
-        user_pref = Foundation.kCFPreferencesAnyUser
-    elif user.lower() == 'current':
-        user_pref = Foundation.kCFPreferencesCurrentUser
-    else:
+    try:
+        user_pref = _USER_MAP[user.lower()]
+    except KeyError:
         raise CommandExecutionError(
             'Error proccessing parameter "user": [{0}], must be "any" or'
             ' "current". NOT [{0}]'.format(user)
         )
 
-    if host.lower() == 'any':
-        host_pref = Foundation.kCFPreferencesAnyHost
-    elif host.lower() == 'current':
-        host_pref = Foundation.kCFPreferencesCurrentHost
-    else:
+    try:
+        host_pref = _HOST_MAP[host.lower()]
+    except KeyError:
         raise CommandExecutionError(
             'Error proccessing parameter "host": [{0}], must be "any" or'
             ' "current". NOT [{0}]'.format(host)
         )
-    log.debug('Using user domain: [{}] and host domain: [{}]'.format(user_pref,
-                                                                     host_pref))
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug('Using user domain: [{}] and host domain: [{}]'.format(user_pref,
+                                                                         host_pref))
     return (user_pref, host_pref)
 
 
+def _runas_uid(runas):
+    '''
+    returns the uid of the runas user, or None if no runas user was given.
+    '''
+    if not runas:
+        return None
+    if runas in _UID_CACHE:
+        return _UID_CACHE[runas]
+    try:
+        uid = pwd.getpwnam(runas).pw_uid
+    except KeyError:
+        raise CommandExecutionError(
+            'Set to runas user {}, this user'
+            ' does not exist.'.format(runas)
+        )
+    _UID_CACHE[runas] = uid
+    return uid
+
+
+@contextlib.contextmanager
+def _as_user(uid):
+    '''
+    context manager that sets the effective uid for the duration of the block
+    and restores the previous one afterwards. Nothing is changed if uid is
+    None or already the effective uid, so nested use costs no syscalls.
+    '''
+    current = os.geteuid()
+    if uid is None or uid == current:
+        yield
+        return
+
+    log.debug('Setting EUID to %s', uid)
+    os.seteuid(uid)
+    try:
+        yield
+    finally:
+        os.seteuid(current)
+
+
 def _read_pref(name, domain, user, host, runas):
     '''
     helper function for reading the preference, either at the user level
     or system level
     '''
-    if runas:
-        try:
-            # convert to uid for later use.
-            uid = pwd.getpwnam(runas).pw_uid
-        except KeyError:
-            raise CommandExecutionError(
-                'Set to runas user {}, this user'
-                ' does not exist.'.format(runas)
-            )
-        # need to run as the user
-        log.debug('Setting EUID to {}'.format(runas))
-        os.seteuid(uid)
-
     if user:
         user_domain, host_domain = _get_user_and_host(user, host)
         log.debug('Reading key: "{}" in domain: "{}"'.format(name, domain))
-        value = Foundation.CFPreferencesCopyValue(name,
-                                                  domain,
-                                                  user_domain,
-                                                  host_domain)
-        os.seteuid(0)
-        return value
-
-    #need to bring ourselves back up to root
-    path = '/var/root/Library/Preferences/'
-    d_path = os.path.join(path, domain)
-    log.debug('Reading key: "{}" in domain: "{}" at "{}"'.format(name, domain, d_path))
+        if runas and user_domain == Foundation.kCFPreferencesCurrentUser:
+            # root can read another user's domain by passing their short name
+            # as the user, which avoids switching the euid.
+            value = Foundation.CFPreferencesCopyValue(name,
+                                                      domain,
+                                                      runas,
+                                                      host_domain)
+            if value is not None:
+                return value
+            # not found that way, which includes values only visible to the
+            # user themselves (e.g. managed preferences), so ask as the user.
+        with _as_user(_runas_uid(runas)):
+            return Foundation.CFPreferencesCopyValue(name,
+                                                     domain,
+                                                     user_domain,
+                                                     host_domain)
+
+    if log.isEnabledFor(logging.DEBUG):
+        d_path = os.path.join('/var/root/Library/Preferences/', domain)
+        log.debug('Reading key: "{}" in domain: "{}" at "{}"'.format(name, domain, d_path))
     return Foundation.CFPreferencesCopyAppValue(name, domain)
 
 
@@ -129,42 +198,75 @@ def _set_pref(name, value, domain, user, host, runas):
     sets the pref for the user not at the app value level
     returns true or false if the preference was set correctly or not.
     '''
-    if runas:
-        try:
-            # convert to uid for later use.
-            uid = pwd.getpwnam(runas).pw_uid
-        except KeyError:
-            raise CommandExecutionError(
-                'Set to runas user {}, this user'
-                ' does not exist.'.format(runas)
-            )
-        # need to run as the user
-        log.debug('Setting EUID to {}'.format(runas))
-        os.seteuid(uid)
     if user:
         pref_user, pref_host = _get_user_and_host(user, host)
-        path = '/Library/Preferences/'
-        d_path = os.path.join(path, domain)
-        log.debug('Settting key: "{}" to value: "{}" in '
-                  'domain: "{}" in "{}"'.format(name, value, domain, d_path))
+        if log.isEnabledFor(logging.DEBUG):
+            d_path = os.path.join('/Library/Preferences/', domain)
+            log.debug('Settting key: "{}" to value: "{}" in '
+                      'domain: "{}" in "{}"'.format(name, value, domain, d_path))
+        uid = _runas_uid(runas)
         try:
-            set_val = Foundation.CFPreferencesSetValue(name,
-                                                       value,
-                                                       domain,
-                                                       pref_user,
-                                                       pref_host)
-            Foundation.CFPreferencesAppSynchronize(domain)
-            os.seteuid(0)
-            return set_val
+            with _as_user(uid):
+                Foundation.CFPreferencesSetValue(name,
+                                                 value,
+                                                 domain,
+                                                 pref_user,
+                                                 pref_host)
+            _DIRTY_DOMAINS.add((domain, user, host, runas))
+            return True
         except BaseException:
             log.warning('prefs._set_pref caught exception on user set.')
             return False
-    path = '/var/root/Library/Preferences/'
-    d_path = os.path.join(path, domain)
-    log.debug('Settting key: "{}" to value: "{}" in'
-              ' domain: "{}" in "{}"'.format(name, value, domain, d_path))
+    if log.isEnabledFor(logging.DEBUG):
+        d_path = os.path.join('/var/root/Library/Preferences/', domain)
+        log.debug('Settting key: "{}" to value: "{}" in'
+                  ' domain: "{}" in "{}"'.format(name, value, domain, d_path))
     Foundation.CFPreferencesSetAppValue(name, value, domain)
-    return Foundation.CFPreferencesAppSynchronize(domain)
+    _DIRTY_DOMAINS.add((domain, None, None, None))
+    return True
+
+
+def _sync_pref(domain, user, host, runas):
+    '''
+    helper function for writing pending changes of a single domain to disk.
+    '''
+    if not user:
+        return Foundation.CFPreferencesAppSynchronize(domain)
+
+    pref_user, pref_host = _get_user_and_host(user, host)
+    with _as_user(_runas_uid(runas)):
+        return Foundation.CFPreferencesSynchronize(domain, pref_user, pref_host)
+
+
+def flush(domain=None):
+    '''
+    Write preference changes made by prefs.set to disk.
+
+    domain
+        Only write pending changes for this domain. By default every domain
+        with pending changes is written.
+
+    :return: A Boolean on whether or not all pending changes were written.
+
+    :rtype: bool
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' prefs.flush
+        salt '*' prefs.flush com.apple.ScreenSaver
+    '''
+    pending = [dirty for dirty in _DIRTY_DOMAINS if domain is None or dirty[0] == domain]
+    result = True
+    for dirty in pending:
+        _DIRTY_DOMAINS.discard(dirty)
+        if not _sync_pref(*dirty):
+            log.warning('prefs.flush failed to synchronize domain {}'.format(dirty[0]))
+            result = False
+
+    return result
+
 
 def read(name, domain, user=None, host=None, runas=None):
     '''
@@ -211,7 +313,8 @@ def read(name, domain, user=None, host=None, runas=None):
                                               runas))
 
 
-def set_(name, value, domain, user=None, host=None, runas=None):
+def set_(name, value, domain, user=None, host=None, runas=None, sync=True,
+         verify=True):
     '''
     Set a preference value using CFPreferences.
 
@@ -234,6 +337,16 @@ def set_(name, value, domain, user=None, host=None, runas=None):
     runas
         The user to run as should be a short username.
 
+    sync
+        Write the domain to disk straight away. Pass False when setting many
+        keys and call prefs.flush once afterwards.
+
+    verify
+        Read the key back after setting it to make sure the new value took
+        effect, e.g. that it is not overridden by a managed preference.
+        CFPreferencesSetValue does not report failure, so this is the only
+        check that the value was set. Defaults to True.
+
     :return: A Boolean on whether or not the preference was set correctly.
 
     :rtype: bool
@@ -244,6 +357,8 @@ def set_(name, value, domain, user=None, host=None, runas=None):
 
         salt '*' prefs.set IdleTime 180 com.apple.ScreenSaver
         salt '*' prefs.set IdleTime 180 com.apple.ScreenSaver True
+        salt '*' prefs.set IdleTime 180 com.apple.ScreenSaver sync=False
+        salt '*' prefs.set IdleTime 180 com.apple.ScreenSaver verify=False
     '''
     if (runas and not host) or (runas and not user)\
         or (runas and not user and not host):
@@ -255,18 +370,25 @@ def set_(name, value, domain, user=None, host=None, runas=None):
             'If using "host" or "user" you must specify both not just one.'
         )
     set_val = _set_pref(name, value, domain, user, host, runas)
+    if not set_val:
+        return False
 
-    # get the value to check if it was set correctly.
-    new_val = read(name, domain, user, host, runas)
+    if verify:
+        # get the value to check if it was set correctly, pending changes are
+        # visible to this process before they are written to disk.
+        new_val = _read_pref(name, domain, user, host, runas)
 
-    log.debug('New value for key: "{}" in domain: '
-              '"{}" is "{}"'.format(name, domain, new_val))
+        log.debug('New value for key: "{}" in domain: '
+                  '"{}" is "{}"'.format(name, domain, new_val))
 
-    # check to see if everything was set correctly
-    if new_val != value:
-        log.debug('prefs.set Value of {}, for key {}, '
-                  'was not set properly.'.format(value, name))
-        return False
+        # check to see if everything was set correctly
+        if not _pref_equals(new_val, value):
+            log.debug('prefs.set Value of {}, for key {}, '
+                      'was not set properly.'.format(value, name))
+            return False
+
+    if sync:
+        return flush(domain)
 
     return True
 
@@ -310,33 +432,25 @@ def list_(name, user, host, runas=None, values=False):
             'If using "host" or "user" you must specify both not just one.'
         )
     user_domain, host_domain = _get_user_and_host(user, host)
-    if runas:
-        try:
-            # convert to uid for later use.
-            uid = pwd.getpwnam(runas).pw_uid
-        except KeyError:
-            raise CommandExecutionError(
-                'Set to runas user [{}], this user'
-                ' does not exist.'.format(runas)
-            )
-        # need to run as the user
-        log.debug('Setting EUID to [{}]'.format(runas))
-        os.seteuid(uid)
-    key_list = Foundation.CFPreferencesCopyKeyList(name, user_domain, host_domain)
-    os.seteuid(0)
-    con_key_list = _convert_pyobjc_objects(key_list) or []
-    log.debug('Key list: "{}"'.format(con_key_list))
     if not values:
+        with _as_user(_runas_uid(runas)):
+            key_list = Foundation.CFPreferencesCopyKeyList(name, user_domain, host_domain)
+        con_key_list = _convert_pyobjc_objects(key_list) or []
+        log.debug('Key list: "{}"'.format(con_key_list))
         return con_key_list
 
-    value_dict = dict()
-
-    try:
-        for item in con_key_list:
-            value_dict[item] = read(item, name, user, host, runas)
-    except TypeError as exception:
+    # passing no keys copies every key/value pair in the domain in one call.
+    with _as_user(_runas_uid(runas)):
+        raw_values = Foundation.CFPreferencesCopyMultiple(None,
+                                                          name,
+                                                          user_domain,
+                                                          host_domain)
+    if raw_values is None:
         return None
 
+    value_dict = {key: _convert_pyobjc_objects(raw_values[key])
+                  for key in raw_values}
+
     log.debug('Values List: "{}"'.format(value_dict))
 
     return value_dict
@@ -26,10 +26,14 @@ from __future__ import absolute_import, unicode_literals, print_function
 import os
 import re
 import pwd
+import pickle
 import plistlib
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 # Import salt libs
 import logging
+import salt.utils.atomicfile
 import salt.utils.files
 import salt.utils.path
 import salt.utils.platform
@@ -43,10 +47,6 @@ from salt.exceptions import CommandExecutionError
 from salt.utils.versions import LooseVersion as _LooseVersion
 from salt.modules.cmdmod import _cmd_quote as _cmd_quote
 
-# Import 3rd party libs
-from salt.ext import six
-from salt.ext.six.moves import range, zip, map
-
 #global logger
 log = logging.getLogger(__name__)
 
@@ -57,6 +57,27 @@ __func_alias__ = {
 	'list_': 'list',
 }
 
+# Number of threads used to read service plists.
+_PLIST_WORKERS = 8
+
+# Service plists larger than this many bytes are not read.
+_MAX_PLIST_SIZE = 16 * 1024 * 1024
+
+# Path and basename lookups for the services dict, see _service_index.
+_SERVICE_INDEX = {}
+
+# Seconds that console_user results are reused for, and the cached results
+# keyed by the username argument.
+_CONSOLE_USER_TTL = 10
+_CONSOLE_USER_CACHE = {}
+
+# Format of the services in the available_services disk cache, bump this when
+# the services dict changes so that older caches are not used.
+_SERVICES_CACHE_VERSION = 1
+
+# A line of `launchctl list` output, capturing the PID column and everything after the status column as the label.
+_LAUNCHCTL_LIST_RE = re.compile(r'^(\S+)[ \t]+\S+[ \t]+(.+?)[ \t]*$', re.M)
+
 
 def __virtual__():
 	'''
@@ -98,26 +119,54 @@ def _get_service(name):
 		# Match on label
 		return services[name]
 
-	for service in six.itervalues(services):
-		if service['file_path'].lower() == name:
-			# Match on full path
-			return service
-		basename, ext = os.path.splitext(service['file_name'])
-		if basename.lower() == name:
-			# Match on basename
-			return service
+	by_path, by_basename = _service_index(services)
+
+	if name in by_path:
+		# Match on full path
+		return by_path[name]
+
+	if name in by_basename:
+		# Match on basename
+		return by_basename[name]
 
 	# Could not find service
 	raise CommandExecutionError('Service not found: {0}'.format(name))
 
 
-def _always_running_service(name):
+def _service_index(services):
+	'''
+	Returns dicts of the services keyed by lowercase full path and by
+	lowercase file name without extension. The index is kept for as long as
+	available_services returns the same services dict.
+
+	:param dict services: The services returned by available_services
+
+	:rtype: tuple
+	'''
+	if _SERVICE_INDEX.get('services') is not services:
+		by_path = {}
+		by_basename = {}
+		for service in services.values():
+			by_path.setdefault(service['file_path'].lower(), service)
+			basename, ext = os.path.splitext(service['file_name'])
+			by_basename.setdefault(basename.lower(), service)
+
+		_SERVICE_INDEX['services'] = services
+		_SERVICE_INDEX['index'] = (by_path, by_basename)
+
+	return _SERVICE_INDEX['index']
+
+
+def _always_running_service(name, service=None):
 	'''
 	Check if the service should always be running based on the KeepAlive Key
 	in the service plist.
 
 	:param str name: Service label, file name, or full path
 
+	:param dict service: The service information if it has already been looked
+	up, to avoid looking it up again.
+
 	:return: True if the KeepAlive key is set to True, False if set to False or
 		not set in the plist at all.
 
@@ -127,7 +176,7 @@ def _always_running_service(name):
 	'''
 
 	# get all the info from the launchctl service
-	service_info = show(name)
+	service_info = service or show(name)
 
 	# get the value for the KeepAlive key in service plist
 	try:
@@ -178,17 +227,20 @@ def _get_domain_target(name, service_target=False):
 
 	# check to see if we need to make it a full service target.
 	if service_target is True:
-		domain_target = '{}/{}'.format(domain_target, service['plist']['Label'])
+		domain_target = '{}/{}'.format(domain_target, service['label'])
 
 	return (domain_target, path)
 
 
-def _launch_agent(name):
+def _launch_agent(name, service=None):
 	'''
 	Checks to see if the provided service is a LaunchAgent
 
 	:param str name: Service label, file name, or full path
 
+	:param dict service: The service information if it has already been looked
+	up, to avoid looking it up again.
+
 	:return: True if a LaunchAgent, False if not.
 
 	:rtype: bool
@@ -197,7 +249,7 @@ def _launch_agent(name):
 	'''
 
 	# Get the path to the service.
-	path = _get_service(name)['file_path']
+	path = (service or _get_service(name))['file_path']
 
 	if 'LaunchAgents' not in path:
 		log.debug('"{}" is NOT a LaunchAgent'.format(name))
@@ -206,13 +258,10 @@ def _launch_agent(name):
 	return True
 
 
-def _available_services():
+def _launchd_paths():
 	'''
-	This is a helper function needed for testing. We are using the memoziation
-	decorator on the `available_services` function, which causes the function
-	to run once and then return the results of the first run on subsequent
-	calls. This causes problems when trying to test the functionality of the
-	`available_services` function.
+	Returns the list of directories that launchd loads services from,
+	including the LaunchAgents directory of every user.
 	'''
 	launchd_paths = [
 		'/Library/LaunchAgents',
@@ -222,58 +271,184 @@ def _available_services():
 	]
 
 	try:
-		for user in os.listdir('/Users/'):
-			agent_path = '/Users/{}/Library/LaunchAgents/'.format(user)
-			if os.path.isdir(agent_path):
-				launchd_paths.append(agent_path)
+		with os.scandir('/Users/') as users:
+			for user in users:
+				if not user.is_dir():
+					continue
+				agent_path = '/Users/{}/Library/LaunchAgents/'.format(user.name)
+				if os.path.isdir(agent_path):
+					launchd_paths.append(agent_path)
 	except OSError:
 		pass
 
-	_available_services = dict()
+	return launchd_paths
+
+
+def _launchd_signature(launchd_paths):
+	'''
+	Returns a tuple of (path, mtime, size) for each launchd directory and each
+	plist file in it. If the signature is unchanged since the services were
+	last scanned, none of the plist files need to be read again.
+	'''
+	signature = []
 	for launch_dir in launchd_paths:
-		for root, dirs, files in salt.utils.path.os_walk(launch_dir):
-			for file_name in files:
+		try:
+			entries = os.scandir(launch_dir)
+			stat = os.stat(launch_dir)
+		except OSError:
+			continue
+
+		signature.append((launch_dir, stat.st_mtime_ns, stat.st_size))
+		with entries:
+			for entry in entries:
+				if not entry.name.endswith('.plist'):
+					continue
+				try:
+					stat = entry.stat(follow_symlinks=True)
+				except OSError:
+					continue
+				signature.append((entry.path, stat.st_mtime_ns, stat.st_size))
+
+	return tuple(sorted(signature))
+
+
+def _read_plist(path):
+	'''
+	Read a plist file, plistlib detects and reads both XML and binary plists.
+	'''
+	with salt.utils.files.fopen(path, 'rb') as fp_:
+		return plistlib.load(fp_)
+
+
+def _try_read_plist(plist_file):
+	'''
+	Read a (file_name, true_path) plist for _available_services, returning
+	None if plistlib is unable to read it.
+	'''
+	try:
+		return _read_plist(plist_file[1])
+	except Exception:
+		return None
+
+
+def _convert_plists(files):
+	'''
+	Convert plists that plistlib cannot read with the system provided plutil
+	program. All files are converted by a single plutil process.
+
+	:param list files: (file_name, true_path) tuples
+
+	:return: The parsed plists, in the same order as files
+	:rtype: list
+	'''
+	cmd = ['/usr/bin/plutil', '-convert', 'xml1', '-o', '-', '--']
+	cmd.extend(true_path for file_name, true_path in files)
+	# stderr is kept apart from stdout, so that plutil's diagnostics can never
+	# be parsed as part of a document.
+	ret = salt.modules.cmdmod.run_all(cmd, output_loglevel='quiet', python_shell=False)
+
+	# plutil writes each converted document to stdout one after the other.
+	documents = ['<?xml' + doc for doc in ret['stdout'].split('<?xml')[1:]]
+	if ret['retcode'] != 0 or ret['stderr'] or len(documents) != len(files):
+		# a file failed to convert, so the documents cannot be matched up to
+		# the files. Convert them one at a time instead.
+		documents = [
+			salt.modules.cmdmod.run_stdout(cmd[:-len(files)] + [true_path],
+										   output_loglevel='quiet',
+										   python_shell=False)
+			for file_name, true_path in files]
+
+	plists = []
+	for (file_name, true_path), document in zip(files, documents):
+		try:
+			plists.append(plistlib.loads(
+				salt.utils.stringutils.to_bytes(document)))
+		except Exception:
+			log.warning('Unable to read service plist {}'.format(true_path))
+			plists.append({})
+
+	return plists
+
+
+def _add_service(services, file_name, true_path, plist):
+	'''
+	Add a parsed service plist to the services dict, keyed by its lowercase
+	label.
+	'''
+	try:
+		label = plist['Label']
+		key = label.lower()
+	except (KeyError, TypeError, AttributeError):
+		# Handle malformed plist files
+		label = os.path.splitext(file_name)[0]
+		key = os.path.basename(file_name).lower()
+
+	services[key] = {
+		'file_name': file_name,
+		'file_path': true_path,
+		'label': label,
+		'plist': plist}
+
+
+def _available_services(launchd_paths=None):
+	'''
+	This is a helper function needed for testing. We are using the memoziation
+	decorator on the `available_services` function, which causes the function
+	to run once and then return the results of the first run on subsequent
+	calls. This causes problems when trying to test the functionality of the
+	`available_services` function.
+	'''
+	if launchd_paths is None:
+		launchd_paths = _launchd_paths()
+
+	plist_files = []
+	for launch_dir in launchd_paths:
+		# launchd directories are flat, so there is no need to walk them.
+		try:
+			entries = os.scandir(launch_dir)
+		except OSError:
+			continue
+
+		with entries:
+			for entry in entries:
+				file_name = entry.name
 
 				# Must be a plist file
 				if not file_name.endswith('.plist'):
 					continue
 
-				# Follow symbolic links of files in _launchd_paths
-				file_path = os.path.join(root, file_name)
-				true_path = os.path.realpath(file_path)
+				# Follow symbolic links of files in _launchd_paths, this is
+				# False for broken symlinks so they are ignored.
+				if not entry.is_file(follow_symlinks=True):
+					continue
 
-				# ignore broken symlinks
-				if not os.path.exists(true_path):
+				# plistlib trusts the sizes stored in binary plists, so a small
+				# malformed plist can make it allocate huge buffers. No genuine
+				# service plist is anywhere near this size.
+				if entry.stat(follow_symlinks=True).st_size > _MAX_PLIST_SIZE:
+					log.warning('Skipping oversized service plist {}'.format(entry.path))
 					continue
 
-				try:
-					# This assumes most of the plist files
-					# will be already in XML format
-					plist = plistlib.readPlist(true_path)
-
-				except Exception:
-					# If plistlib is unable to read the file we'll need to use
-					# the system provided plutil program to do the conversion
-					cmd = '/usr/bin/plutil -convert xml1 -o - -- "{0}"'.format(
-						true_path)
-					plist_xml = salt.modules.cmdmod.run(cmd, output_loglevel='quiet')
-					if six.PY2:
-						plist = plistlib.readPlistFromString(plist_xml)
-					else:
-						plist = plistlib.loads(
-							salt.utils.stringutils.to_bytes(plist_xml))
+				plist_files.append((file_name, os.path.realpath(entry.path)))
 
-				try:
-					_available_services[plist.Label.lower()] = {
-						'file_name': file_name,
-						'file_path': true_path,
-						'plist': plist}
-				except AttributeError:
-					# Handle malformed plist files
-					_available_services[os.path.basename(file_name).lower()] = {
-						'file_name': file_name,
-						'file_path': true_path,
-						'plist': plist}
+	# Reading the plists is mostly file I/O, so they are read concurrently.
+	# This only uses plistlib, none of the CoreFoundation API that is unsafe to
+	# call from threads in the minion.
+	with ThreadPoolExecutor(max_workers=_PLIST_WORKERS) as executor:
+		plists = list(executor.map(_try_read_plist, plist_files))
+
+	_available_services = dict()
+	unreadable = []
+	for (file_name, true_path), plist in zip(plist_files, plists):
+		if plist is None:
+			# converted with plutil below.
+			unreadable.append((file_name, true_path))
+		else:
+			_add_service(_available_services, file_name, true_path, plist)
+
+	if unreadable:
+		for (file_name, true_path), plist in zip(unreadable, _convert_plists(unreadable)):
+			_add_service(_available_services, file_name, true_path, plist)
 
 	return _available_services
 
@@ -293,7 +468,32 @@ def available_services():
 		import salt.utils.mac_service
 		salt.utils.mac_service.available_services()
 	'''
-	return _available_services()
+	# The scan is cached on disk between module loads, it is only redone if a
+	# launchd directory or plist file has changed since it was written.
+	launchd_paths = _launchd_paths()
+	signature = _launchd_signature(launchd_paths)
+	cache_file = os.path.join(__opts__['cachedir'], 'mac_service_available.p')
+
+	try:
+		with salt.utils.files.fopen(cache_file, 'rb') as fp_:
+			cached = pickle.load(fp_)
+		if cached['version'] == _SERVICES_CACHE_VERSION and cached['sig'] == signature:
+			return cached['data']
+	except Exception:
+		# missing, unreadable or outdated cache file
+		pass
+
+	services = _available_services(launchd_paths)
+
+	try:
+		with salt.utils.atomicfile.atomic_open(cache_file, 'wb') as fp_:
+			pickle.dump({'version': _SERVICES_CACHE_VERSION,
+						 'sig': signature,
+						 'data': services}, fp_)
+	except (IOError, OSError) as exc:
+		log.debug('Unable to write service cache {}: {}'.format(cache_file, exc))
+
+	return services
 
 
 def console_user(username=False):
@@ -317,6 +517,13 @@ def console_user(username=False):
 		import salt.utils.mac_service
 		salt.utils.mac_service.console_user()
 	'''
+	# the console user rarely changes, so results are reused for a few
+	# seconds rather than checked again for every service in a state run.
+	cached = _CONSOLE_USER_CACHE.get(username)
+	now = time.time()
+	if cached and now - cached[0] < _CONSOLE_USER_TTL:
+		return cached[1]
+
 	try:
 		# returns the 'st_uid' stat from the /dev/console file.
 		uid = os.stat('/dev/console')[4]
@@ -324,10 +531,10 @@ def console_user(username=False):
 		# we should never get here but raise an error if so
 		raise CommandExecutionError('Failed to get a UID for the console user.')
 
-	if username:
-		return pwd.getpwuid(uid)[0]
+	result = pwd.getpwuid(uid)[0] if username else uid
+	_CONSOLE_USER_CACHE[username] = (now, result)
 
-	return uid
+	return result
 
 
 def show(name):
@@ -434,11 +641,11 @@ def list_(name=None, runas=None):
 	if name:
 		# Get service information and label
 		service = _get_service(name)
-		label = service['plist']['Label']
+		label = service['label']
 
 		# we can assume if we are trying to list a LaunchAgent we need
 		# to run as a user, if not provided, we'll use the console user.
-		if not runas and _launch_agent(name):
+		if not runas and _launch_agent(name, service):
 			runas = __salt__['service.console_user'](username=True)
 
 		# Collect information on service: will raise an error if it fails
@@ -618,11 +825,12 @@ def status(name, sig=None, runas=None):
 	# set to run on intervals and may not always active with a PID. This will
 	# return a string 'loaded' if it shouldn't always be running and is enabled.
 	log.debug('Checking to see if "{}" is enabled and supposed to be running.')
-	if not _always_running_service(name) and enabled(name):
+	service = _get_service(name)
+	if not _always_running_service(name, service) and enabled(name):
 		return 'loaded'
 
 	log.debug('"{}"service is an always running service.'.format(name))
-	if not runas and _launch_agent(name):
+	if not runas and _launch_agent(name, service):
 		log.debug('need to set runas user. setting to console_user')
 		runas = __salt__['service.console_user'](username=True)
 
@@ -630,17 +838,10 @@ def status(name, sig=None, runas=None):
 
 	# Used a string here instead of a list because that's what the linux version
 	# of this module does
-	pids = ''
-	for line in output.splitlines():
-		if 'PID' in line:
-			continue
-		if re.search(name, line.split()[-1]):
-			if line.split()[0].isdigit():
-				if pids:
-					pids += '\n'
-				pids += line.split()[0]
-
-	return pids
+	name_re = re.compile(name)
+	return '\n'.join(match.group(1)
+					  for match in _LAUNCHCTL_LIST_RE.finditer(output)
+					  if match.group(1).isdigit() and name_re.search(match.group(2)))
 
 
 def available(name):
@@ -747,14 +948,7 @@ def get_all(runas=None):
 
 		salt '*' service.get_all
 	'''
-	# Get list of enabled services
-	enabled = get_enabled(runas=runas)
-
-	# Get list of all services
-	available = list(__salt__['service.available_services']().keys())
-
-	# Return composite list
-	return sorted(set(enabled + available))
+	return sorted(set(get_enabled(runas=runas)).union(__salt__['service.available_services']()))
 
 
 def get_enabled(runas=None):
@@ -775,16 +969,15 @@ def get_enabled(runas=None):
 	'''
 	# Collect list of enabled services
 	stdout = list_(runas=runas)
-	service_lines = [line for line in stdout.splitlines()]
 
 	# Construct list of enabled services
-	enabled = []
-	for line in service_lines:
+	enabled = set()
+	for line in stdout.splitlines():
 		# Skip header line
 		if line.startswith('PID'):
 			continue
 
-		pid, status, label = line.split('\t')
-		enabled.append(label)
+		pid, status, label = line.split('\t', 2)
+		enabled.add(label)
 
-	return sorted(set(enabled))
+	return sorted(enabled)
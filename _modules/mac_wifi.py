@@ -10,6 +10,7 @@ import collections
 import logging
 import os.path
 import sys
+import time
 
 try:
     import objc, ctypes.util
@@ -26,6 +27,19 @@ from salt.exceptions import CommandExecutionError
 __virtualname__ = 'wifi'
 log = logging.getLogger(__name__)
 
+__func_alias__ = {
+    'apply_': 'apply',
+}
+
+# Frameworks loaded by _load_objc_framework, by name.
+_FRAMEWORKS = {}
+
+# Seconds that the SSIDs and profiles read by _get_ssids/_get_profiles are
+# reused for, and the cached (time, value) results. Any change to the
+# configuration clears the cache.
+_READ_CACHE_TTL = 0.5
+_READ_CACHE = {}
+
 
 def __virtual__():
     """
@@ -49,6 +63,10 @@ def _load_objc_framework(framework_name):
 
     :rtype: object
     """
+    # loading the bundle is expensive, and it only needs to happen once.
+    if framework_name in _FRAMEWORKS:
+        return _FRAMEWORKS[framework_name]
+
     log.trace('wifi._load_objc_framework: loading {}.'.format(framework_name))
     loaded_classes = dict()
     framework_bundle = objc.loadBundle(
@@ -63,6 +81,7 @@ def _load_objc_framework(framework_name):
     for name, loaded_class in loaded_classes.items():
         if not name.startswith('_'):
             setattr(framework, name, loaded_class)
+    _FRAMEWORKS[framework_name] = framework
     return framework
 
 
@@ -73,15 +92,20 @@ def _get_configuration(CoreWLAN, interface):
 
 
 def _get_available_wifi_interfaces(CoreWLAN):
-    interfaces = dict()
-    for name in CoreWLAN.CWInterface.interfaceNames() or []:
-        try:
-            interfaces[name] = CoreWLAN.CWInterface.interfaceWithName_(name)
-        except TypeError:
-            # Wifi is either disabled or we're running on a VM with alternate network configs.
-            log.trace('module.mac_wifi - Unable to get interface name.')
-            continue
-    return interfaces
+    # the shared client hands back every interface in one call, this is empty
+    # if Wifi is disabled or we're running on a VM with alternate network configs.
+    interfaces = CoreWLAN.CWWiFiClient.sharedWiFiClient().interfaces() or []
+    return dict((interface.interfaceName(), interface) for interface in interfaces)
+
+
+def _get_default_wifi_interface(CoreWLAN, interfaces):
+    '''
+    get the default WiFi interface, falling back to the first available one.
+    '''
+    default = CoreWLAN.CWWiFiClient.sharedWiFiClient().interface()
+    if default is not None and default.interfaceName() in interfaces:
+        return interfaces[default.interfaceName()]
+    return interfaces[sorted(interfaces)[0]]
 
 
 def _get_profiles_and_ssids(configuration):
@@ -93,138 +117,238 @@ def _get_profiles_and_ssids(configuration):
         # we'll return a tuple of empty lists. Theres probably a better way to
         # handle this.
         log.trace('module.mac_wifi - Could not find an SSIDs.')
-        return ([], [])
+        return ([], [], {})
     # Grab all the SSIDs, in order
     SSIDs = [x.ssid() for x in profiles]
-    return (profiles, SSIDs)
+    # and index the profiles by SSID, keeping the first profile for an SSID.
+    index = {}
+    for ssid, profile in zip(SSIDs, profiles):
+        index.setdefault(ssid, profile)
+    return (profiles, SSIDs, index)
 
 
-def _manipulate_wifi(name, func, just_ssids=False, just_profiles=False):
+def _apply_ops(interface, configuration_copy, profiles, index, ops):
+    '''
+    Apply a list of (func, name) operations to the profiles of a mutable
+    configuration copy, then commit the configuration to the interface once.
+    Returns the result of the commit.
+    '''
+    # takes the functions to run here as a parameter, so we can remove, sort,
+    # top or bottom.
+    for func, name in ops:
+        profiles = func(name, profiles=profiles, index=index)
+    # Now we have to update the mutable configuration
+    # First convert it back to a NSOrderedSet
+    log.trace('wifi._apply_ops: Attempting to set changed WiFi profiles.')
+    profile_set = NSOrderedSet.orderedSetWithArray_(profiles)
+    # Then set/overwrite the configuration copy's networkProfiles
+    configuration_copy.setNetworkProfiles_(profile_set)
+    # Then update the network interface configuration
+    return interface.commitConfiguration_authorization_error_(configuration_copy, None, None)
+
+
+def _manipulate_wifi(name, func, just_ssids=False, just_profiles=False, ops=None):
     '''
     The core of this code comes from this gist by Pudquick. Thank you!
     https://gist.github.com/pudquick/fcbdd3924ee230592ab4
+
+    ops may be given instead of name and func as a list of (func, name)
+    tuples, these are all applied before the configuration is committed.
     '''
+    if ops is None:
+        ops = [(func, name)]
+
+    if not (just_ssids or just_profiles):
+        # the configuration is about to change.
+        _READ_CACHE.clear()
+
     CoreWLAN = _load_objc_framework('CoreWLAN')
     interfaces = _get_available_wifi_interfaces(CoreWLAN)
 
     if not interfaces:
+        if just_profiles or just_ssids:
+            return []
         return (False, 'No WiFi devices found to manage.')
 
-    for interface in interfaces.keys():
-        # Grab a mutable copy of this interface's configuration
-        configuration_copy = CoreWLAN.CWMutableConfiguration.alloc().initWithConfiguration_(
-            interfaces[interface].configuration())
-        # Find all the preferred/remembered network profiles
-        pro_ssid = _get_profiles_and_ssids(configuration_copy)
-        profiles = pro_ssid[0]
-        SSIDs = pro_ssid[1]
+    if just_profiles or just_ssids:
+        # reads come from the default interface, and don't need the mutable
+        # copy of the configuration.
+        profiles, SSIDs, index = _get_profiles_and_ssids(
+            _get_default_wifi_interface(CoreWLAN, interfaces).configuration())
 
-        # return just the profiles.
-        if just_profiles:
-            return profiles
+        # return just the profiles, or just the list of SSID's
+        return profiles if just_profiles else SSIDs
 
-        # check to see if we want just the list of SSID's
-        if just_ssids:
-            return SSIDs
+    for interface in interfaces.values():
+        # Grab a mutable copy of this interface's configuration
+        configuration_copy = _get_configuration(CoreWLAN, interface)
+        # Find all the preferred/remembered network profiles
+        profiles, SSIDs, index = _get_profiles_and_ssids(configuration_copy)
 
         # see if we actually have any SSID's.
         if not SSIDs:
-            # we can bounce out since there isn't anything to do with any empty
-            # list of SSIDs
-            return True
-
-        # takes the function to run here as a parameter, so we can remove, sort,
-        # top or bottom.
-        profiles = func(name, profiles=profiles)
-        # Now we have to update the mutable configuration
-        # First convert it back to a NSOrderedSet
-        log.trace('wifi._manipulate_wifi: Attempting to set changed WiFi profiles.')
-        profile_set = NSOrderedSet.orderedSetWithArray_(profiles)
-        # Then set/overwrite the configuration copy's networkProfiles
-        configuration_copy.setNetworkProfiles_(profile_set)
-        # Then update the network interface configuration
-        result = interfaces[interface].commitConfiguration_authorization_error_(configuration_copy, None, None)
-    try:
-        if result[0] == 1:
-            return True
-    except Exception as e:
-        ret = 'wifi._manipulate_wifi'
-        return (False,
-                'Caught Exception: {} in parsing return from {}'.format(e, ret))
-    return (False, result[1])
+            # there isn't anything to do with an empty list of SSIDs on
+            # this interface.
+            continue
+
+        result = _apply_ops(interface, configuration_copy, profiles, index, ops)
+        try:
+            if result[0] != 1:
+                return (False, result[1])
+        except Exception as e:
+            ret = 'wifi._manipulate_wifi'
+            return (False,
+                    'Caught Exception: {} in parsing return from {}'.format(e, ret))
+    return True
+
+
+def _cached_read(key, **kwargs):
+    '''
+    read the SSIDs or profiles, reusing a result read less than
+    _READ_CACHE_TTL seconds ago.
+    '''
+    now = time.time()
+    cached = _READ_CACHE.get(key)
+    if cached and now - cached[0] < _READ_CACHE_TTL:
+        return cached[1]
+
+    value = _manipulate_wifi(None, None, **kwargs)
+    _READ_CACHE[key] = (now, value)
+    return value
 
 
 def _get_ssids():
-    return _manipulate_wifi(None, None, just_ssids=True)
+    return _cached_read('ssids', just_ssids=True)
 
 
 def _get_profiles():
     'returns the Newtork profiles'
-    return _manipulate_wifi(None, None, just_profiles=True)
+    return _cached_read('profiles', just_profiles=True)
 
 
-def _top(name, profiles=None):
+def _partition(name, profiles):
+    '''
+    split profiles into those for the SSID name and the rest, keeping their
+    order and asking each profile for its SSID only once.
+    '''
+    matched = []
+    rest = []
+    for profile in profiles:
+        if profile.ssid() == name:
+            matched.append(profile)
+        else:
+            rest.append(profile)
+    return matched, rest
+
+
+def _top(name, profiles=None, index=None):
     '''
     move name to the top of this in reverse order to they appear correctly
     '''
 
-    # sort name to the top.
+    # move name to the top, keeping the order of everything else.
     log.trace('Attempting to move SSID [{}] to the top.'.format(name))
-    profiles.sort(key=lambda x: x.ssid() == name, reverse=True)
+    matched, rest = _partition(name, profiles)
 
-    return profiles
+    return matched + rest
 
 
-def _bottom(name, profiles=None):
+def _bottom(name, profiles=None, index=None):
     '''
     move name to the bottom of the list in reverse order to they appear correctly
     '''
 
     log.trace('Attempting to move SSID [{}] to the bottom.'.format(name))
-    profiles.sort(key=lambda x: x.ssid() == name, reverse=False)
+    matched, rest = _partition(name, profiles)
 
-    return profiles
+    return rest + matched
 
 
-def _remove(name, profiles=None):
+def _remove(name, profiles=None, index=None):
     '''
     remove name from the preferred list.
     '''
-    log.trace('called wifi._remove')
+    log.trace('wifi._remove: Removing SSID {} from list.'.format(name))
+
+    # build a new list rather than removing from the list being iterated,
+    # which would skip the profile following each removed one.
+    return [ssid for ssid in profiles if ssid.ssid() != name]
+
+
+def _find_profile(name, profiles, index=None):
+    '''
+    find the profile for the given SSID, using the SSID index if available.
+    '''
+    if index is not None:
+        return index.get(name)
 
     for ssid in profiles:
         if ssid.ssid() == name:
-            log.trace('wifi._remove: Removing SSID {} from list.'.format(
-                name))
-            profiles.remove(ssid)
+            return ssid
+    return None
 
-    return profiles
 
-
-def _disable_autojoin(name, profiles=None):
+def _disable_autojoin(name, profiles=None, index=None):
     '''
     disables autojoin for the given SSID
     '''
-    for ssid in profiles:
-        if ssid.ssid() == name:
-            log.trace('Disabling AutoJoin for SSID [{}].'.format(name))
-            ssid.setDisabled_(True)
-            break
+    ssid = _find_profile(name, profiles, index)
+    if ssid is not None:
+        log.trace('Disabling AutoJoin for SSID [{}].'.format(name))
+        ssid.setDisabled_(True)
     return profiles
 
 
-def _enable_autojoin(name, profiles=None):
+def _enable_autojoin(name, profiles=None, index=None):
     '''
-    disables autojoin for the given SSID
+    enables autojoin for the given SSID
     '''
-    for ssid in profiles:
-        if ssid.ssid() == name:
-            log.trace('Enabling AutoJoin for SSID [{}].'.format(name))
-            ssid.setDisabled_(False)
-            break
+    ssid = _find_profile(name, profiles, index)
+    if ssid is not None:
+        log.trace('Enabling AutoJoin for SSID [{}].'.format(name))
+        ssid.setDisabled_(False)
     return profiles
 
 
+# Operations accepted by wifi.apply
+_OPERATIONS = {
+    'top': _top,
+    'bottom': _bottom,
+    'remove': _remove,
+    'disable_autojoin': _disable_autojoin,
+    'enable_autojoin': _enable_autojoin,
+}
+
+
+def apply_(ops):
+    '''
+    Apply several changes to the Preferred Networks list, committing the
+    configuration only once.
+
+    :param list ops: A list of ``[operation, SSID]`` pairs, applied in order.
+        Valid operations are ``top``, ``bottom``, ``remove``,
+        ``disable_autojoin`` and ``enable_autojoin``.
+
+    :return: ``True`` if successful, or ``False`` if it failed.
+
+    :rtype: bool
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' wifi.apply '[[remove, Hooli-Guest], [top, PiedPiper]]'
+    '''
+    try:
+        funcs = [(_OPERATIONS[op], name) for op, name in ops]
+    except (KeyError, TypeError, ValueError):
+        raise CommandExecutionError(
+            'Invalid wifi operations {}, expected a list of [operation, SSID] '
+            'pairs with operations from: {}'.format(ops, ', '.join(sorted(_OPERATIONS))))
+
+    return _manipulate_wifi(None, None, ops=funcs) is True
+
+
 def top(name):
     '''
     Move a SSID to the TOP of the Preffered Networks Order list.
@@ -288,13 +412,9 @@ def remove(name):
     .. note::
         If you would like to add an SSID consider using a macOS profile.
     '''
-    # attempt to remove the ssid
-    remove_wifi = _manipulate_wifi(name, func=_remove)
-
-    # check to see if it was remove correctly.
-    if __salt__['wifi.missing'](name):
-        return True
-    return False
+    # attempt to remove the ssid, the commit result tells us whether it
+    # was removed correctly.
+    return _manipulate_wifi(name, func=_remove) is True
 
 
 def exists(name):
@@ -394,12 +514,9 @@ def disable_autojoin(name):
     '''
     if not __salt__['wifi.exists'](name):
         return False
-    # disable autojoin
-    disable_aj = _manipulate_wifi(name, func=_disable_autojoin)
-
-    log.trace('Checking if SSID [{}] was disabled correctly.'.format(name))
-    # check if autojoin was actually disabled properly
-    return True if __salt__['wifi.autojoin_disabled'](name) else False
+    # disable autojoin, the commit result tells us whether it was disabled
+    # properly.
+    return _manipulate_wifi(name, func=_disable_autojoin) is True
 
 
 def enable_autojoin(name):
@@ -422,11 +539,9 @@ def enable_autojoin(name):
     if not __salt__['wifi.exists'](name):
         return False
 
-    enable_aj = _manipulate_wifi(name, func=_enable_autojoin)
-
-    log.trace('Checking if SSID [{}] was enabled correctly.'.format(name))
-    # check if autojoin was enabled properly
-    return True if __salt__['wifi.autojoin_enabled'](name) else False
+    # enable autojoin, the commit result tells us whether it was enabled
+    # properly.
+    return _manipulate_wifi(name, func=_enable_autojoin) is True
 
 
 def autojoin_disabled(name):
@@ -445,16 +560,13 @@ def autojoin_disabled(name):
 
         salt '*' wifi.disable_autojoin Hooli-Guest
     '''
-    profiles = _get_profiles()
-    for ssid in profiles:
-        if ssid.ssid() == name:
-            log.trace('Found network profile for SSID [{}].'.format(name))
-            if ssid.disabled():
-                return True
-            return False
+    ssid = _find_profile(name, _get_profiles())
+    if ssid is None:
+        log.debug('Could not find profile for [{}].'.format(name))
+        return False
 
-    log.debug('Could not find profile for [{}].'.format(name))
-    return False
+    log.trace('Found network profile for SSID [{}].'.format(name))
+    return bool(ssid.disabled())
 
 
 def autojoin_enabled(name):
@@ -473,10 +585,13 @@ def autojoin_enabled(name):
 
         salt '*' wifi.autojoin_enabled PiedPiper
     '''
-    if not __salt__['wifi.exists'](name):
+    ssid = _find_profile(name, _get_profiles())
+    if ssid is None:
+        log.debug('Could not find profile for [{}].'.format(name))
         return False
 
-    return not __salt__['wifi.autojoin_disabled'](name)
+    log.trace('Found network profile for SSID [{}].'.format(name))
+    return not ssid.disabled()
 
 
 def current_ssid():
@@ -495,7 +610,11 @@ def current_ssid():
     '''
     cmd = '/usr/sbin/networksetup -getairportnetwork en0'
     try:
-        return __salt__['cmd.run'](cmd).split(':')[1].lstrip().rstrip()
-    except (CommandExecutionError, IndexError) as err:
+        output = __salt__['cmd.run'](cmd)
+    except CommandExecutionError as err:
         log.trace('Caught Error: {}'.format(err))
-        return None
\ No newline at end of file
+        return None
+
+    # only split on the first colon, the SSID itself may contain colons.
+    _, sep, ssid = output.partition(':')
+    return ssid.strip() if sep else None
\ No newline at end of file
@@ -22,25 +22,43 @@ are always a bit clunky, so need to put some thought into this.
 :platform:      darwin
 '''
 
+import copy
 import logging
+import os
+import plistlib
+import re
+from collections.abc import Mapping
+
 import salt.exceptions
+import salt.utils.files
 
 log = logging.getLogger(__name__)  # Start logging
 
 HAS_LIBS = False
 try:
-    import os
-
+    import objc
     from Foundation import NSData, \
         NSPropertyListSerialization, \
         NSPropertyListMutableContainers, \
+        NSPropertyListImmutable, \
         NSPropertyListXMLFormat_v1_0, \
         NSPropertyListBinaryFormat_v1_0, \
         NSNumber, \
         NSString, \
         NSMutableDictionary, \
-        NSMutableArray, \
-        NSMutableData
+        NSMutableArray
+
+    # Bound once here so that PyObjC doesn't resolve the selectors again on every read or write.
+    _plist_from_data = NSPropertyListSerialization.propertyListWithData_options_format_error_
+    _data_from_plist = NSPropertyListSerialization.dataWithPropertyList_format_options_error_
+
+    _NSTYPE_CONSTRUCTORS = {
+        'string': NSString.stringWithUTF8String_,
+        'int': NSNumber.numberWithInt_,
+        'float': NSNumber.numberWithFloat_,
+        'bool': lambda v: v == 'true',
+        'data': lambda v: NSData.alloc().initWithBase64EncodedString_options_(v, 0),
+    }
 
     HAS_LIBS = True
 except ImportError:
@@ -48,6 +66,11 @@ except ImportError:
 
 __virtualname__ = 'plist'
 
+# Foundation's XML plist parser recurses once per nested container and crashes the whole minion somewhere past
+# ~180 levels, so deeper documents are refused before they reach it.
+_MAX_XML_DEPTH = 150
+_XML_CONTAINER_RE = re.compile(br'<(/?)(?:dict|array)\b[^>]*?(/?)>')
+
 
 def __virtual__():
     '''
@@ -62,46 +85,148 @@ def __virtual__():
     return __virtualname__
 
 
-def _read_plist(filepath):
+def _check_xml_depth(contents):
+    '''
+    Raise SaltInvocationError if the XML property list in contents nests dicts or arrays deeper than
+    _MAX_XML_DEPTH. Binary property lists are not checked.
+    '''
+    if contents.startswith(b'bplist'):
+        return
+
+    depth = 0
+    for match in _XML_CONTAINER_RE.finditer(contents):
+        closing, empty = match.groups()
+        if closing:
+            depth -= 1
+        elif not empty:
+            depth += 1
+            if depth > _MAX_XML_DEPTH:
+                raise salt.exceptions.SaltInvocationError(
+                    'Property List nests more than {0} levels deep'.format(_MAX_XML_DEPTH)
+                )
+
+
+def _read_plist(filepath, with_format=False, mutable=True):
     """
     Read a .plist file from filepath.  Return the unpacked root object
     (which is usually a dictionary).
 
+    If mutable is false, the containers are parsed as immutable objects. Only pass this when the result will not be
+    modified.
+
+    If with_format is true, a tuple of the root object and the format to write the file back in is returned. That
+    is binary if the file was binary and XML otherwise.
+
     If the file doesn't exist, this returns None
     """
-    if not os.path.isfile(filepath):
+    try:
+        with salt.utils.files.fopen(filepath, 'rb') as fh:
+            contents = fh.read()
+    except (IOError, OSError):
         log.debug('Tried to read non-existent property list at path: {0}'.format(filepath))
-        return None
+        return (None, NSPropertyListXMLFormat_v1_0) if with_format else None
+
+    # NSPropertyListSerialization picks the binary or XML parser from the header by itself, an empty file has no
+    # header at all and can never parse, so don't hand it over.
+    if not contents:
+        log.debug('Tried to read empty property list at path: {0}'.format(filepath))
+        return (None, NSPropertyListXMLFormat_v1_0) if with_format else None
 
-    plistData = NSData.dataWithContentsOfFile_(filepath)
+    _check_xml_depth(contents)
+    plistData = NSData.dataWithBytesNoCopy_length_freeWhenDone_(contents, len(contents), False)
 
-    dataObject, plistFormat, error = \
-        NSPropertyListSerialization.propertyListFromData_mutabilityOption_format_errorDescription_(
-            plistData, NSPropertyListMutableContainers, None, None)
+    options = NSPropertyListMutableContainers if mutable else NSPropertyListImmutable
+    dataObject, plistFormat, error = _plist_from_data(plistData, options, None, None)
     if error:
-        error = error.encode('ascii', 'ignore')
+        error = error.localizedDescription()
 
         raise salt.exceptions.SaltInvocationError(
             'Error decoding Property List : {}'.format(error)
         )
+    elif with_format:
+        # NSPropertyListSerialization can't write the old OpenStep (ASCII) format, so only binary is kept and
+        # everything else is written back as XML.
+        if plistFormat != NSPropertyListBinaryFormat_v1_0:
+            plistFormat = NSPropertyListXMLFormat_v1_0
+        return dataObject, plistFormat
     else:
         return dataObject
 
 
-def _write_plist(dataObject, filepath, format=NSPropertyListXMLFormat_v1_0):
+def _read_plist_native(filepath, with_format=False, mutable=False):
+    """
+    Read a .plist file from filepath into native python types using plistlib, without crossing the PyObjC bridge
+    for every object.
+
+    If with_format is true, a tuple of the root object and the format the file was stored in is returned, so that
+    the file can be written back in the same format.
+
+    Unless mutable is true, the parsed result is kept in __context__ for the rest of this salt run, until the
+    file's modification time or size changes, and the same object is handed to every caller, so it must not be
+    modified. Pass mutable when the result will be changed, public functions return a copy of it.
+
+    Property lists that plistlib can't parse (such as the old ASCII format) are read by _read_plist instead,
+    mutable is passed on to it in that case. Those results are Foundation objects rather than python types and
+    are not cached.
+
+    If the file doesn't exist, this returns None
+    """
+    try:
+        with salt.utils.files.fopen(filepath, 'rb') as fh:
+            st = os.fstat(fh.fileno())
+            signature = (st.st_mtime_ns, st.st_size)
+            cached = __context__.get('plist.cache', {}).get(filepath)
+            if not mutable and cached is not None and cached[0] == signature:
+                return cached[1:] if with_format else cached[1]
+
+            contents = fh.read()
+    except (IOError, OSError):
+        log.debug('Tried to read non-existent property list at path: {0}'.format(filepath))
+        return (None, NSPropertyListXMLFormat_v1_0) if with_format else None
+
+    if not contents:
+        log.debug('Tried to read empty property list at path: {0}'.format(filepath))
+        return (None, NSPropertyListXMLFormat_v1_0) if with_format else None
+
+    try:
+        dataObject = plistlib.loads(contents)
+    except Exception as exc:
+        # plistlib doesn't limit itself to ValueError on malformed input (a bad <date> raises AttributeError), and
+        # NSPropertyListSerialization may still be able to read the file, so any failure falls back to it.
+        log.debug('Falling back to NSPropertyListSerialization for property list at path: %s (%s)', filepath, exc)
+        return _read_plist(filepath, with_format=with_format, mutable=mutable)
+
+    if contents.startswith(b'bplist00'):
+        plistFormat = NSPropertyListBinaryFormat_v1_0
+    else:
+        plistFormat = NSPropertyListXMLFormat_v1_0
+
+    if not mutable:
+        __context__.setdefault('plist.cache', {})[filepath] = (signature, dataObject, plistFormat)
+
+    return (dataObject, plistFormat) if with_format else dataObject
+
+
+def _write_plist(dataObject, filepath, format=None, atomic=True):
     '''
-    Write 'rootObject' as a plist to filepath.
+    Write 'rootObject' as a plist to filepath, in XML unless another format is given.
+
+    If atomic is true the data is written to a temporary file which then replaces filepath, otherwise filepath is
+    written in place.
     '''
-    plistData, error = \
-        NSPropertyListSerialization.dataFromPropertyList_format_errorDescription_(
-            dataObject, format, None)
+    __context__.get('plist.cache', {}).pop(filepath, None)
+
+    if format is None:
+        format = NSPropertyListXMLFormat_v1_0
+
+    plistData, error = _data_from_plist(dataObject, format, 0, None)
     if error:
-        error = error.encode('ascii', 'ignore')
+        error = error.localizedDescription()
         raise salt.exceptions.SaltInvocationError(
             'Error encoding Property List: {}'.format(error)
         )
     else:
-        if plistData.writeToFile_atomically_(filepath, True):
+        if plistData.writeToFile_atomically_(filepath, atomic):
             return
         else:
             raise salt.exceptions.SaltInvocationError(
@@ -109,90 +234,112 @@ def _write_plist(dataObject, filepath, format=NSPropertyListXMLFormat_v1_0):
             )
 
 
-def _generate_plist_string(rootObject, format=NSPropertyListXMLFormat_v1_0):
-    '''Return 'rootObject' as a plist-formatted string.'''
-    plistData, error = \
-        NSPropertyListSerialization.dataFromPropertyList_format_errorDescription_(
-            rootObject, format, None)
+def _generate_plist_string(rootObject, format=None):
+    '''Return 'rootObject' as a plist-formatted string, in XML unless another format is given.'''
+    if format is None:
+        format = NSPropertyListXMLFormat_v1_0
+
+    plistData, error = _data_from_plist(rootObject, format, 0, None)
     if error:
-        error = error.encode('ascii', 'ignore')
+        error = error.localizedDescription()
         raise salt.exceptions.SaltInvocationError(
             'Error encoding Property List: {}'.format(error)
         )
     else:
-        return str(plistData)
+        return bytes(plistData).decode('utf-8')
 
 
 def _value_to_nsobject(value, nstype):
     '''Convert a string with a type specifier to a native Objective-C NSObject (serializable).'''
-    return {
-        'string': lambda v: NSString.stringWithUTF8String_(v),
-        'int': lambda v: NSNumber.numberWithInt_(v),
-        'float': lambda v: NSNumber.numberWithFloat_(v),
-        'bool': lambda v: True if v == 'true' else False,
-        'data': lambda v: NSMutableData.dataWithLength_(len(value)).initWithBase64EncodedString_options_(value)
-    }[nstype](value)
-
-def _objects_for_dict(dict, keys, collector):
+    return _NSTYPE_CONSTRUCTORS[nstype](value)
+
+def _objects_for_dict(root, keys, collector):
     """Extract a section of a Property List by providing an existing structure (dict) of the keys.
 
-    Recursive call traverses the specified keys in the NSDictionary, and retrieves the associated
+    Recursive call traverses the specified keys in the plist root, and retrieves the associated
     object at each 'leaf node', assigning a hierarchy of keys and the found value to the collector.
 
+    The root is expected to come from _read_plist_native, so the walk stays in python and doesn't cross the
+    PyObjC bridge for every key.
+
         Args:
-            dict (NSDictionary): The current dictionary being operated on
+            root (dict): The current dictionary being operated on
 
-            keys: The current dict describing a key or nested key in the dict parameter.
+            keys: The current dict describing a key or nested key in the root parameter.
 
             collector: A reference to the current dict which can have value(s) set.
     """
     # Stop collecting values if the specified key hierarchy doesn't exist.
-    if dict is None:
-        collector = None
+    if not isinstance(root, Mapping):
         return
 
     for key, value in keys.items():
-        if type(value) is dict:
-            collector[key] = {}
-            plist_value = dict.objectForKey_(key)
-            _objects_for_dict(plist_value, value, collector[key])
-        else:
+        if not isinstance(value, dict):
+            collector[key] = root.get(key)
+            continue
+
+        collector[key] = {}
+        _objects_for_dict(root.get(key), value, collector[key])
+
 
-            collector[key] = dict.objectForKey_(key)
+def _value_for_key_list(root, keys):
+    '''
+    Get a value inside a nested dict structure read by _read_plist_native, using a list of keys to traverse.
+    '''
+    # User accidentally supplies zero length key, stop there and return whatever was reached before it
+    if '' in keys:
+        keys = keys[:keys.index('')]
+
+    node = root
+    for key in keys:
+        if not isinstance(node, Mapping):
+            log.debug('No key found in Property List: {0}'.format(key))
+            return None
+        node = node.get(key)
 
-def _set_objects_for_keys(dict, keys, changed=None):
+    return node
+
+
+def _set_objects_for_keys(root, keys, changed=None):
     """Set plist values using a given dict.
 
     Recursively finds or creates keys given and sets their values. This can be used to maintain a partial or
     complete override of any given property list file.
 
+    Missing structure is created as plain python dicts, the whole tree is converted once when it is serialized.
+
         Args:
-            dict (NSMutableDictionary): The current dictionary being operated on. For a non existent file this will be
+            root (dict): The current dictionary being operated on. For a non existent file this will be
             blank.
 
             keys: A dict representing a hierarchy with leaf node values.
+
+            changed: A dict used to record changes made
     """
     if changed is None:
         changed = dict()
 
     for key, value in keys.items():
-        existing_value = dict.objectForKey_(key)
-
-        if type(value) is dict:
-            # Value unavailable, so create structure
-            if existing_value is None:
-                child = NSMutableDictionary()
-                dict.setObject_forKey_(child, key)
+        existing_value = root.get(key)
 
-            changed[key] = {}
-            _set_objects_for_keys(child, value, changed[key])
-        else:
+        if not isinstance(value, dict):
             if existing_value != value:
-                dict.setObject_forKey_(value, key)
+                root[key] = value
                 changed[key] = value
+            continue
+
+        # Value unavailable, so create structure
+        if not isinstance(existing_value, Mapping):
+            existing_value = {}
+            root[key] = existing_value
+
+        child_changed = {}
+        _set_objects_for_keys(existing_value, value, child_changed)
+        if child_changed:
+            changed[key] = child_changed
 
 
-def _remove_objects_for_keys(dict, keys, changed=None):
+def _remove_objects_for_keys(root, keys, changed=None):
     """Remove plist values using a given dict.
 
     Traverse each entry in the keys dict and remove the corresponding key (if it exists).
@@ -200,7 +347,7 @@ def _remove_objects_for_keys(dict, keys, changed=None):
     If the key was removed, the full path to that key is indicated in the changed dict.
 
         Args:
-            dict (NSMutableDictionary): The current dictionary being operated on. For a non existent file this will be
+            root (NSMutableDictionary): The current dictionary being operated on. For a non existent file this will be
             blank.
 
             keys: A dict representing a hierarchy pointing to keys to be removed
@@ -211,15 +358,43 @@ def _remove_objects_for_keys(dict, keys, changed=None):
         changed = dict()
 
     for key, value in keys.items():
-        existing_value = dict.objectForKey_(key)
-
-        if not existing_value is None:  # No need to process removal for non existent keys
-            if type(value) is dict:
-                changed[key] = {}
-                _remove_objects_for_keys(existing_value, value, changed[key])  # Recurse deeper until not a dict
-            else:
-                dict.removeObjectForKey_(key)
-                changed[key] = value
+        existing_value = root.objectForKey_(key)
+
+        if existing_value is None:  # No need to process removal for non existent keys
+            continue
+
+        if not isinstance(value, dict):
+            root.removeObjectForKey_(key)
+            changed[key] = value
+        elif isinstance(existing_value, Mapping):
+            child_changed = {}
+            _remove_objects_for_keys(existing_value, value, child_changed)  # Recurse deeper until not a dict
+            if child_changed:
+                changed[key] = child_changed
+
+
+def _walk(dict, keys, create=False, createNSType=None):
+    '''
+    Walk a nested NSDictionary structure following every key except the last, and return the containing object.
+
+    If create is true, then missing elements are automatically created as NSMutableDictionary objects, otherwise
+    None is returned as soon as a key along the path is missing.
+    '''
+    if createNSType is None:
+        createNSType = NSMutableDictionary
+
+    node = dict
+    for key in keys[:-1]:
+        child = node.objectForKey_(key)
+        if child is None:
+            if not create:
+                log.debug('No key found in Property List: {0}'.format(key))
+                return None
+            child = createNSType()
+            node.setObject_forKey_(child, key)
+        node = child
+
+    return node
 
 
 def _object_for_key_list(dict, keys, create=False):
@@ -228,48 +403,36 @@ def _object_for_key_list(dict, keys, create=False):
 
     If create is true, then missing elements are automatically created as NSMutableDictionary objects.
     '''
-    key = keys.pop(0)
-
-    # User accidentally supplies zero length key
-    if len(key) == 0:
-        return dict
+    # User accidentally supplies zero length key, stop there and return whatever was reached before it
+    if '' in keys:
+        keys = keys[:keys.index('')]
+        if not keys:
+            return dict
+
+    node = _walk(dict, keys, create)
+    if node is None:
+        return None
 
-    if len(keys) > 0:
-        value = dict.objectForKey_(key)
-        if value is None:
-            if create:
-                created = NSMutableDictionary()
-                dict.setObject_forKey_(created, key)
-                return _object_for_key_list(created, keys, create)
-            else:  # Just return None if path was not found
-                log.debug('No key found in Property List: {0}'.format(key))
-                return None
-        else:
-            return _object_for_key_list(dict.objectForKey_(key), keys, create)
-    else:
-        # TODO: special case for array index notation [x] if current object is NSArray
-        # if dict.isKindOfClass_(NSArray.class_()):
-        # return
-        return dict.objectForKey_(key)
+    # TODO: special case for array index notation [x] if current object is NSArray
+    # if dict.isKindOfClass_(NSArray.class_()):
+    # return
+    return node.objectForKey_(keys[-1])
 
 
-def _set_object_for_key_list(dict, keys, value, create=True, createNSType=NSMutableDictionary):
+def _set_object_for_key_list(dict, keys, value, create=True, createNSType=None):
     '''
     Set the value of an object inside a nested NSDictionary structure, using a list of keys to traverse.
 
     If create is true, then missing elements are automatically created as NSMutableDictionary objects.
     createNSType can be passed a constructor to another possible collection type.
     '''
-    key = keys.pop(0)
-
-    # User accidentally supplies zero length key
-    if len(key) == 0:
+    # User accidentally supplies zero length key, nothing is changed
+    if '' in keys:
         return dict
 
-    if len(keys) > 0:
-        return _object_for_key_list(dict.objectForKey_(key), keys, create)
-    else:
-        dict.setObject_forKey_(value, key)
+    node = _walk(dict, keys, create, createNSType)
+    if node is not None:
+        node.setObject_forKey_(value, keys[-1])
 
 
 def _addObjectForKeyList(dict, keys, value, create=True):
@@ -280,35 +443,40 @@ def _addObjectForKeyList(dict, keys, value, create=True):
     If the create argument is true, non existent keys will be created as NSMutableDictionaries. The last item of the
     keys list will be created as an NSArray, and then the supplied value will be appended as an object
     '''
-    key = keys.pop(0)
-
-    # User accidentally supplies zero length key
-    if len(key) == 0:
+    # User accidentally supplies zero length key, nothing is changed
+    if '' in keys:
         return dict
 
-    if len(keys) > 0:
-        return _object_for_key_list(dict.objectForKey_(key), keys, create)
-    else:
-        dict.setObject_forKey_(value, key)
+    node = _walk(dict, keys, create)
+    if node is None:
+        return None
+
+    collection = node.objectForKey_(keys[-1])
+    if collection is None:
+        if not create:
+            return None
+        collection = NSMutableArray()
+        node.setObject_forKey_(collection, keys[-1])
+
+    collection.addObject_(value)
 
 
 def _remove_object_for_key_list(dict, keys):
     '''
     Remove an object inside a nested NSDictionary structure, using a list of nested keys
     '''
-    key = keys.pop(0)
-
-    # User accidentally supplies zero length key
-    if len(key) == 0:
+    # User accidentally supplies zero length key, nothing is changed
+    if '' in keys:
         return dict
 
-    if len(keys) > 0:
-        return _object_for_key_list(dict.objectForKey_(key), keys)
-    else:
-        # TODO: special case for array index notation [x] if current object is NSArray
-        # if dict.isKindOfClass_(NSArray.class_()):
-        # return
-        return dict.removeObjectForKey_(key)
+    node = _walk(dict, keys)
+    if node is None:
+        return None
+
+    # TODO: special case for array index notation [x] if current object is NSArray
+    # if dict.isKindOfClass_(NSArray.class_()):
+    # return
+    return node.removeObjectForKey_(keys[-1])
 
 
 def gen_string(data, format='xml'):
@@ -322,16 +490,14 @@ def gen_string(data, format='xml'):
         Generate format, 'xml' or 'binary'
     '''
     serialization = NSPropertyListXMLFormat_v1_0 if format == 'xml' else NSPropertyListBinaryFormat_v1_0
-    plistData, error = \
-        NSPropertyListSerialization.dataFromPropertyList_format_errorDescription_(
-            data, serialization, None)
+    plistData, error = _data_from_plist(data, serialization, 0, None)
     if error:
-        error = error.encode('ascii', 'ignore')
+        error = error.localizedDescription()
         log.debug('Error writing plist')
         log.debug(error)
-        raise NSPropertyListSerializationException(error)
+        raise salt.exceptions.SaltInvocationError(error)
     else:
-        return plistData
+        return bytes(plistData)
 
 def parse_string(data):
     '''
@@ -339,18 +505,20 @@ def parse_string(data):
 
     Used by other modules in salt-osx
     '''
-    plistData = buffer(data)
-    dataObject, plistFormat, error = \
-        NSPropertyListSerialization.propertyListFromData_mutabilityOption_format_errorDescription_(
-            plistData, NSPropertyListMutableContainers, None, None)
-    if error:
-        error = error.encode('ascii', 'ignore')
+    if not isinstance(data, bytes):
+        data = data.encode('utf-8')
 
-        import traceback
+    _check_xml_depth(data)
+
+    # The parsed containers do not reference the buffer, so it only has to outlive the call below.
+    plistData = NSData.dataWithBytesNoCopy_length_freeWhenDone_(data, len(data), False)
+    dataObject, plistFormat, error = _plist_from_data(plistData, NSPropertyListMutableContainers, None, None)
+    if error:
+        error = error.localizedDescription()
 
         log.debug('Error parsing plist from string')
         log.debug(error)
-        raise NSPropertyListSerializationException(error)
+        raise salt.exceptions.SaltInvocationError(error)
     else:
         return dataObject
 
@@ -370,14 +538,12 @@ def read_key(path, key=''):
 
         salt '*' plist.read <path> [key]
     '''
-    dataObject = _read_plist(path)
+    dataObject = _read_plist(path, mutable=False)
 
     if dataObject is None:
         return None
 
     keys = key.split(':')
-    if type(keys) is str:
-        keys = list(keys)
 
     value = _object_for_key_list(dataObject, keys)
     return value
@@ -407,12 +573,10 @@ def write_key(path, key, nstype, value):
         salt '*' plist.write <path> <key> <nstype> [value]
     '''
     log.debug('Reading original plist for modification at path: %s' % path)
-    dataObject = _read_plist(path)
+    dataObject, plistFormat = _read_plist(path, with_format=True)
 
     log.debug('Deriving key hierarchy from colon separated string')
     keys = key.split(':')
-    if type(keys) is str:
-        keys = list(keys)
 
     if dataObject is None:
         dataObject = NSMutableDictionary()
@@ -422,7 +586,7 @@ def write_key(path, key, nstype, value):
     log.debug('Setting object value in hierarchy')
     _set_object_for_key_list(dataObject, keys, nsval)
     log.debug('Writing out plist to original path')
-    _write_plist(dataObject, path)
+    _write_plist(dataObject, path, plistFormat)
 
 
 def delete_key(path, key):
@@ -439,18 +603,16 @@ def delete_key(path, key):
 
         salt '*' plist.delete <path> [key]
     '''
-    dataObject = _read_plist(path)
+    dataObject, plistFormat = _read_plist(path, with_format=True)
 
     if dataObject is None:
         return None  # None indicating no action was taken.
 
 
     keys = key.split(':')
-    if type(keys) is str:
-        keys = list(keys)
 
     _remove_object_for_key_list(dataObject, keys)
-    _write_plist(dataObject, path)
+    _write_plist(dataObject, path, plistFormat)
 
 
 def append_key(path, key, nstype, value):
@@ -468,12 +630,10 @@ def append_key(path, key, nstype, value):
         salt '*' plist.append_key <path> <key> <nstype> <value>
     '''
     log.debug('Reading original plist for modification at path: %s' % path)
-    root = _read_plist(path)
+    root, plistFormat = _read_plist(path, with_format=True)
 
     log.debug('Deriving key hierarchy from colon separated string')
     keys = key.split(':')
-    if type(keys) is str:
-        keys = list(keys)
 
     if root is None:
         raise salt.exceptions.SaltInvocationError('Tried to append to non existing file, not currently supported.')
@@ -482,10 +642,7 @@ def append_key(path, key, nstype, value):
     nsval = _value_to_nsobject(value, nstype)
     log.debug('Setting object value in hierarchy')
 
-    if len(keys) > 1:
-        parent = _object_for_key_list(root, keys[:-1])
-    else:
-        parent = root
+    parent = _walk(root, keys)
 
     log.debug('Updating or creating object at key: {}'.format(keys[-1]))
     collection = parent.objectForKey_(keys[-1])
@@ -498,12 +655,9 @@ def append_key(path, key, nstype, value):
     collection.addObject_(nsval)
 
     log.debug('Writing out plist to original path')
-
-    from pprint import pprint
-    pprint(root)
-    xml_plist = _generate_plist_string(root, NSPropertyListXMLFormat_v1_0)
-    log.debug(xml_plist)
-    _write_plist(root, path)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(_generate_plist_string(root, NSPropertyListXMLFormat_v1_0))
+    _write_plist(root, path, plistFormat)
 
 
 def read(path):
@@ -517,7 +671,12 @@ def read(path):
 
         salt '*' plist.read <path>
     '''
-    dataObject = _read_plist(path)
+    dataObject = _read_plist_native(path)
+
+    # Only trees parsed by plistlib are cached and shared, Foundation objects from the fallback reader are not.
+    if isinstance(dataObject, (dict, list)):
+        return copy.deepcopy(dataObject)
+
     return dataObject
 
 def write(path, contents_dict):
@@ -544,16 +703,32 @@ def read_keys(path, keys):
     keys
         A dict describing a key or nested keys, with any leaf values used to look up the
         corresponding plist value.
+
+        A list of colon separated key paths (as accepted by read_key) may be given instead, in which case
+        the property list is parsed once and a dict of each key path to its value is returned.
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' plist.read_keys <path> '[path:to:name, other]'
     """
-    dataObject = _read_plist(path)
+    dataObject = _read_plist_native(path)
 
-    collector = {}
-    _objects_for_dict(dataObject, keys, collector)
+    if isinstance(keys, (list, tuple)):
+        collector = dict((key, _value_for_key_list(dataObject, key.split(':'))) for key in keys)
+    else:
+        collector = {}
+        _objects_for_dict(dataObject, keys, collector)
+
+    # Values parsed by plistlib are shared with the cached property list, don't let callers change it.
+    if isinstance(dataObject, (dict, list)):
+        return copy.deepcopy(collector)
 
     return collector
 
 
-def write_keys(path, keys, test=False):
+def write_keys(path, keys, test=False, atomic=True):
     """
     Write key structure and its values to the given property list.
     If a key does not exist in the target plist, it is created as a dictionary by default.
@@ -567,17 +742,22 @@ def write_keys(path, keys, test=False):
     test
         If test is true, no changes will be written, but you will receive a dict containing the changes that
         would have been performed.
+
+    atomic
+        If atomic is false, the property list is written in place instead of through a temporary file. This
+        avoids writing large files twice, but leaves a partial file behind if the write is interrupted.
     """
-    dataObject = _read_plist(path)
+    dataObject, plistFormat = _read_plist_native(path, with_format=True, mutable=True)
 
     if dataObject is None:
-        dataObject = NSMutableDictionary()
+        dataObject = {}
 
     changed = {}
     _set_objects_for_keys(dataObject, keys, changed)
 
-    if test == False:
-        _write_plist(dataObject, path)
+    if changed and test == False:
+        with objc.autorelease_pool():
+            _write_plist(dataObject, path, plistFormat, atomic)
 
     return changed
 
@@ -597,15 +777,18 @@ def delete_keys(path, keys, test=False):
         If test is true, no changes will be written, but you will receive a dict containing the keys that
         would have been removed.
     """
-    dataObject = _read_plist(path)
-    changed = {}
+    # The traversal below autoreleases an object for every key it visits, drain them when we are done rather
+    # than whenever the minion's pool happens to be drained.
+    with objc.autorelease_pool():
+        dataObject, plistFormat = _read_plist(path, with_format=True)
+        changed = {}
 
-    if dataObject is None:
-        return changed  # No need to remove anything from non existent property list
+        if dataObject is None:
+            return changed  # No need to remove anything from non existent property list
 
-    _remove_objects_for_keys(dataObject, keys, changed)
+        _remove_objects_for_keys(dataObject, keys, changed)
 
-    if test == False:
-        _write_plist(dataObject, path)
+        if changed and test == False:
+            _write_plist(dataObject, path, plistFormat)
 
     return changed
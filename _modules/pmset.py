@@ -5,19 +5,21 @@ Get and set power management settings for different power sources on Mac OS X us
 
 import logging
 import re
-from string import strip, split, join, lower
 import salt.utils
 import salt.exceptions
 
 log = logging.getLogger(__name__)
 
-POWER_SOURCES = ['ac', 'battery']  # ups not supported
+POWER_SOURCES = frozenset(['ac', 'battery'])  # ups not supported
 POWER_SWITCHES = {'ac': '-c', 'battery': '-b'}
-BOOLEAN_SETTINGS = ['womp', 'ring', 'autorestart', 'lidwake', 'acwake', 'lessbright', 'halfdim', 'sms',
-                    'ttyskeepawake', 'destroyfvkeyonstandby', 'autopoweroff']
-VALID_SETTINGS = ['displaysleep', 'disksleep', 'sleep', 'womp', 'ring', 'autorestart', 'lidwake', 'acwake',
-                  'lessbright', 'halfdim', 'sms', 'ttyskeepawake', 'destroyfvkeyonstandby', 'autopoweroff',
-                  'autopoweroffdelay']
+SOURCE_HEADINGS = {'AC': 'ac', 'Battery': 'battery'}
+# Matches either a power source heading, or a line holding exactly one setting name and value.
+PMSET_LINE_RE = re.compile(r'^(?:(AC|Battery) Power:.*|[ \t]*(\S+)[ \t]+(\S+)[ \t]*)$', re.M)
+BOOLEAN_SETTINGS = frozenset(['womp', 'ring', 'autorestart', 'lidwake', 'acwake', 'lessbright', 'halfdim', 'sms',
+                              'ttyskeepawake', 'destroyfvkeyonstandby', 'autopoweroff'])
+VALID_SETTINGS = frozenset(['displaysleep', 'disksleep', 'sleep', 'womp', 'ring', 'autorestart', 'lidwake',
+                            'acwake', 'lessbright', 'halfdim', 'sms', 'ttyskeepawake', 'destroyfvkeyonstandby',
+                            'autopoweroff', 'autopoweroffdelay'])
 
 __virtualname__ = 'pmset'
 
@@ -37,33 +39,25 @@ def list_settings():
 
         salt '*' pmset.list_settings
     '''
-    output = __salt__['cmd.run']('/usr/bin/pmset -g custom').splitlines()
+    output = __salt__['cmd.run']('/usr/bin/pmset -g custom')
 
-    if len(output) == 0:
+    if not output:
         return None
 
     settings = dict()
     current = dict()
     source = None
 
-    for line in output:
-        if re.search("^AC Power:", line):
+    for heading, key, value in PMSET_LINE_RE.findall(output):
+        if heading:
             if source is not None:
                 settings[source] = current
                 current = dict()
-            source = "ac"
-        elif re.search("^Battery Power:", line):
-            if source is not None:
-                settings[source] = current
-                current = dict()
-            source = "battery"
+            source = SOURCE_HEADINGS[heading]
+        elif key in BOOLEAN_SETTINGS:
+            current[key] = True if value == "1" else False
         else:
-            kv = split(strip(line))
-            if len(kv) == 2:
-                if kv[0] in BOOLEAN_SETTINGS:
-                    current[kv[0]] = True if kv[1] == "1" else False
-                else:
-                    current[kv[0]] = kv[1]
+            current[key] = value
 
     if current != dict():
         settings[source] = current
@@ -134,16 +128,16 @@ def set_settings(name, **kwargs):
             'Invalid power source given: {}'.format(name)
         )
 
-    valid_settings = {k: str(v) for k, v in kwargs.iteritems() if k in VALID_SETTINGS}
+    valid_settings = {k: str(v) for k, v in kwargs.items() if k in VALID_SETTINGS}
     normal_settings = {}
 
-    for k, v in valid_settings.iteritems():
+    for k, v in valid_settings.items():
         if k in BOOLEAN_SETTINGS:
-            normal_settings[k] = '1' if lower(v) == 'true' or v == '1' else '0'
+            normal_settings[k] = '1' if v.lower() in ('true', '1') else '0'
         else:
             normal_settings[k] = v
 
-    args = join([join(pair, ' ') for pair in normal_settings.iteritems()], ' ')
+    args = ' '.join('{0} {1}'.format(k, v) for k, v in normal_settings.items())
 
     result = __salt__['cmd.run_all'](
         '/usr/bin/pmset {0} {1}'.format(POWER_SWITCHES[name], args)
@@ -16,16 +16,27 @@ log = logging.getLogger(__name__)
 
 HAS_LIBS = False
 try:
-    from ctypes import CDLL
+    from ctypes import CDLL, c_int, c_uint32
 
     IOKit = CDLL("/System/Library/Frameworks/IOKit.framework/Versions/Current/IOKit")
 
+    # io_connect_t and mach_port_t are both just a Uint32, IOReturn/kern_return_t is an int.
     IOPMSleepSystem = IOKit.IOPMSleepSystem
-    IOPMFindPowerManagement = IOKit.IOPMFindPowerManagement  # restype is io_connect_t which is mach_port_t which is just a Uint32
+    IOPMSleepSystem.argtypes = [c_uint32]
+    IOPMSleepSystem.restype = c_int
+
+    IOPMFindPowerManagement = IOKit.IOPMFindPowerManagement
+    IOPMFindPowerManagement.argtypes = [c_uint32]
+    IOPMFindPowerManagement.restype = c_uint32
+
     IOServiceClose = IOKit.IOServiceClose
+    IOServiceClose.argtypes = [c_uint32]
+    IOServiceClose.restype = c_int
+
+    kIOMasterPortDefault = 0
 
     HAS_LIBS = True
-except ImportError:
+except (ImportError, OSError):
     log.debug('Execution module not suitable because one or more imports failed.')
 
 __virtualname__ = 'power'
@@ -56,7 +67,7 @@ def sleep():
 
         salt '*' power.sleep
     '''
-    fb = IOPMFindPowerManagement(None)
+    fb = IOPMFindPowerManagement(kIOMasterPortDefault)
     IOPMSleepSystem(fb)
     IOServiceClose(fb)  # Mach ports always need to be closed
 
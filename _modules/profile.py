@@ -13,14 +13,10 @@ Manage locally installed configuration profiles (.mobileconfig)
 
 
 import base64
-import binascii
 import hashlib
 import logging
-import os
 import plistlib
 import pprint
-import re
-import tempfile
 import uuid
 
 import salt.exceptions
@@ -33,6 +29,47 @@ log = logging.getLogger(__name__)
 
 __virtualname__ = 'profile'
 
+# Hashes that payload UUIDs can be derived with, chosen by the profile.hash_algo minion option. md5 stays the
+# default because changing the hash changes every PayloadUUID, which makes every managed profile look modified.
+_HASH_ALGOS = {
+    'md5': hashlib.md5,
+    'blake2b': lambda data: hashlib.blake2b(data, digest_size=16),
+}
+
+# Keyword arguments accepted by generate().
+VALID_PROPERTIES = frozenset(['description', 'displayname', 'organization', 'content', 'removaldisallowed', 'scope',
+                              'removaldate', 'durationuntilremoval', 'consenttext'])
+
+# generate() keyword argument -> (profile document key, optional value transform). Valid properties missing here
+# (other than content) are accepted but not written to the document yet.
+_KWARG_KEYS = {
+    'description': ('PayloadDescription', None),
+    'displayname': ('PayloadDisplayName', None),
+    'organization': ('PayloadOrganization', None),
+    'removaldisallowed': ('PayloadRemovalDisallowed', lambda v: v is True),
+}
+
+# Advanced Active Directory payload keys that are only applied when a matching <key>Flag = True is also present.
+# See _add_activedirectory_keys.
+_NEEDS_FLAG = frozenset([
+    'ADAllowMultiDomainAuth',
+    'ADCreateMobileAccountAtLogin',
+    'ADDefaultUserShell',
+    'ADDomainAdminGroupList',
+    'ADForceHomeLocal',
+    'ADNamespace',
+    'ADPacketEncrypt',
+    'ADPacketSign',
+    'ADPreferredDCServer',
+    'ADRestrictDDNS',
+    'ADTrustChangePassIntervalDays',
+    'ADUseWindowsUNCPath',
+    'ADWarnUserBeforeCreatingMA',
+    'ADMapUIDAttribute',
+    'ADMapGIDAttribute',
+    'ADMapGGIDAttribute',
+])
+
 
 def __virtual__():
     if salt.utils.platform.is_darwin():
@@ -48,20 +85,36 @@ def _content_to_uuid(payload):
     :param payload:
     :return:
     '''
-    log.debug('Attempting to Hash {}'.format(payload))
+    log.debug('Attempting to Hash %s', payload)
+
+    return _serialized_to_uuid(_serialize(payload))
 
+
+def _serialize(obj):
+    '''
+    Serialize obj to an XML property list string.
+    '''
     if six.PY3:
-        str_payload = plistlib.dumps(payload)
+        return plistlib.dumps(obj)
     else:
-        str_payload = plistlib.writePlistToString(payload)
-    hashobj = hashlib.md5(str_payload)
+        return plistlib.writePlistToString(obj)
 
-    identifier = re.sub(
-        b'([0-9a-f]{8})([0-9a-f]{4})([0-9a-f]{4})([0-9a-f]{4})([0-9a-f]{12})',
-        b'\\1-\\2-\\3-\\4-\\5',
-        binascii.hexlify(hashobj.digest()))
 
-    return identifier.decode()
+def _serialized_to_uuid(str_payload):
+    '''
+    Generate a UUID from an already serialized payload.
+    '''
+    hash_algo = __opts__.get('profile.hash_algo', 'md5')
+
+    try:
+        hashobj = _HASH_ALGOS[hash_algo](str_payload)
+    except KeyError:
+        raise salt.exceptions.SaltInvocationError(
+            'Unsupported profile.hash_algo {}, expected one of: {}'.format(hash_algo, ', '.join(sorted(_HASH_ALGOS)))
+        )
+
+    # Both supported algorithms produce a 16 byte digest, the [:16] only guards against a future wider one.
+    return str(uuid.UUID(bytes=hashobj.digest()[:16]))
 
 
 def _add_activedirectory_keys(payload):
@@ -92,25 +145,9 @@ def _add_activedirectory_keys(payload):
     :param payload:
     :return:
     '''
-    needs_flag = ['ADAllowMultiDomainAuth',
-                  'ADCreateMobileAccountAtLogin',
-                  'ADDefaultUserShell',
-                  'ADDomainAdminGroupList',
-                  'ADForceHomeLocal',
-                  'ADNamespace',
-                  'ADPacketEncrypt',
-                  'ADPacketSign',
-                  'ADPreferredDCServer',
-                  'ADRestrictDDNS',
-                  'ADTrustChangePassIntervalDays',
-                  'ADUseWindowsUNCPath',
-                  'ADWarnUserBeforeCreatingMA',
-                  'ADMapUIDAttribute',
-                  'ADMapGIDAttribute',
-                  'ADMapGGIDAttribute']
-
-    for k in payload.keys():
-        if k in needs_flag:
+    # Snapshot the keys, the loop adds new ones to payload.
+    for k in list(payload.keys()):
+        if k in _NEEDS_FLAG:
             payload[str(k) + 'Flag'] = True
 
 
@@ -121,8 +158,8 @@ def _check_top_level_key(old, new):
     the old and new keys pair differences are
     '''
     try:
-        log.debug('Checking top level key for profile "{}"'.format(
-            new['PayloadIdentifier']))
+        log.debug('Checking top level key for profile "%s"',
+                  new['PayloadIdentifier'])
     except KeyError as e:
         log.warning(e)
         pass
@@ -140,9 +177,9 @@ def _check_top_level_key(old, new):
         'PayloadRemovalDisallowed'
     ]
     for key, value in new.items():
-        log.trace('Checking top level key {}'.format(key))
+        log.trace('Checking top level key %s', key)
         if not key in keys_to_check:
-            log.trace('key {} not in our list of keys to validate'.format(key))
+            log.trace('key %s not in our list of keys to validate', key)
             continue
         if value == 'true':
             value = True
@@ -155,17 +192,17 @@ def _check_top_level_key(old, new):
             if old_value == 'false':
                 old_value = False
         except KeyError as e:
-            log.debug('_check_top_level_key: Caught KeyError on {} trying to replace.'.format(e))
+            log.debug('_check_top_level_key: Caught KeyError on %s trying to replace.', e)
             continue
 
         if value != old_value:
-            log.debug('Found difference in profile Key {}'.format(key))
+            log.debug('Found difference in profile Key %s', key)
             ret['differ'] = True
             new_goods = {key: value}
             old_goods = {key: old_value}
             ret['old_kv'].update(old_goods)
             ret['new_kv'].update(new_goods)
-    log.trace('will return from profile: _check_top_level_key: {}'.format(ret))
+    log.trace('will return from profile: _check_top_level_key: %s', ret)
     return ret
 
 
@@ -176,8 +213,8 @@ def _check_top_level_key(old, new):
     the old and new keys pair differences are
     '''
     try:
-        log.debug('Checking top level key for profile "{}"'.format(
-            new['PayloadIdentifier']))
+        log.debug('Checking top level key for profile "%s"',
+                  new['PayloadIdentifier'])
     except KeyError as e:
         log.warning(e)
         pass
@@ -195,9 +232,9 @@ def _check_top_level_key(old, new):
         'PayloadRemovalDisallowed'
     ]
     for key, value in new.items():
-        log.trace('Checking top level key {}'.format(key))
+        log.trace('Checking top level key %s', key)
         if not key in keys_to_check:
-            log.trace('key {} not in our list of keys to validate'.format(key))
+            log.trace('key %s not in our list of keys to validate', key)
             continue
         if value == 'true':
             value = True
@@ -210,17 +247,17 @@ def _check_top_level_key(old, new):
             if old_value == 'false':
                 old_value = False
         except KeyError as e:
-            log.debug('_check_top_level_key: Caught KeyError on {} trying to replace.'.format(e))
+            log.debug('_check_top_level_key: Caught KeyError on %s trying to replace.', e)
             continue
 
         if value != old_value:
-            log.debug('Found difference in profile Key {}'.format(key))
+            log.debug('Found difference in profile Key %s', key)
             ret['differ'] = True
             new_goods = {key: value}
             old_goods = {key: old_value}
             ret['old_kv'].update(old_goods)
             ret['new_kv'].update(new_goods)
-    log.trace('will return from profile: _check_top_level_key: {}'.format(ret))
+    log.trace('will return from profile: _check_top_level_key: %s', ret)
     return ret
 
 
@@ -240,7 +277,7 @@ def _transform_payload(payload, identifier):
         del payload['PayloadUUID']
 
     hashed_uuid = _content_to_uuid(payload)
-    log.debug('hashed_uuid = {}'.format(hashed_uuid))
+    log.debug('hashed_uuid = %s', hashed_uuid)
 
     if not 'PayloadUUID' in payload:
         payload['PayloadUUID'] = hashed_uuid
@@ -271,10 +308,10 @@ def _transform_content(content, identifier):
         log.debug('module.profile - Found empty content')
         return list()
     log.debug('module.profile - Found GOOD content')
-    log.debug('{}  {}'.format(content, identifier))
+    log.debug('%s  %s', content, identifier)
     transformed = []
     for payload in content:
-        log.debug('module.profile - trying to transform {}'.format(payload))
+        log.debug('module.profile - trying to transform %s', payload)
         transformed.append(_transform_payload(payload, identifier))
 
     # transformed = [_transform_payload(payload, identifier) for payload in content]
@@ -314,7 +351,7 @@ def validate(identifier, profile_dict):
     current_items = __salt__['profile.item_keys'](identifier)
 
     if not current_items:
-        log.debug('Could not find any item keys for {}'.format(identifier))
+        log.debug('Could not find any item keys for %s', identifier)
         ret['old_payload'] = 'Not installed'
         return ret
 
@@ -325,23 +362,23 @@ def validate(identifier, profile_dict):
         log.debug('Failed to get ProfileItems from installed Profile')
         return ret
 
-    installed_uuids = []
+    installed_uuids = set()
     for item in current_profile_items:
         try:
-            installed_uuids.append(item['PayloadUUID'])
+            installed_uuids.add(item['PayloadUUID'])
         except KeyError:
             pass
 
-    log.debug('Found installed uuids {}'.format(installed_uuids))
+    log.debug('Found installed uuids %s', installed_uuids)
 
-    log.debug('Requested install UUIDs are {}'.format(new_uuids))
+    log.debug('Requested install UUIDs are %s', new_uuids)
 
-    for uuid in new_uuids:
-        log.debug('Checking UUID "{}" to is if its installed'.format(uuid))
-        if uuid not in installed_uuids:
+    for new_uuid in new_uuids:
+        log.debug('Checking UUID "%s" to is if its installed', new_uuid)
+        if new_uuid not in installed_uuids:
             ret['changed'] = True
             return ret
-        log.debug('Profile UUID of {} appears to be installed'.format(uuid))
+        log.debug('Profile UUID of %s appears to be installed', new_uuid)
 
     # check the top keys to see if they differ.
     top_keys = _check_top_level_key(current_items, new_prof_data)
@@ -358,33 +395,57 @@ def validate(identifier, profile_dict):
     return ret
 
 
-def items():
+def items(refresh=False):
     '''
     Retrieve all profiles in full
 
+    refresh
+        Re-read the installed profiles instead of returning the copy cached earlier in this run. The cache is
+        dropped by install and remove.
+
     CLI Example:
 
     .. code-block:: bash
 
         salt '*' profiles.items
     '''
-    tmpdir = tempfile.mkdtemp('.profiles')
-    tmpfile = os.path.join(tmpdir, 'profiles.plist')
+    if 'profile.items' in __context__ and not refresh:
+        return __context__['profile.items']
 
-    status = __salt__['cmd.retcode']('/usr/bin/profiles -P -o {}'.format(tmpfile))
+    # profiles writes the plist straight to our pipe, so there is no temporary file to create and clean up.
+    result = __salt__['cmd.run_all']('/usr/bin/profiles -P -o /dev/stdout', python_shell=False)
 
-    if not status == 0:
+    if not result['retcode'] == 0:
         raise salt.exceptions.CommandExecutionError(
-            'Failed to read profiles or write to temporary file'
+            'Failed to read profiles: {}'.format(result['stderr'])
         )
 
-    profiles = plistlib.readPlist(tmpfile)
-    os.unlink(tmpfile)
-    os.rmdir(tmpdir)
+    plist_text = result['stdout']
+    if not plist_text.strip():
+        profiles = {}
+    elif six.PY3:
+        profiles = plistlib.loads(plist_text.encode('utf-8'))
+    else:
+        profiles = plistlib.readPlistFromString(plist_text)
 
+    __context__['profile.items'] = profiles
+    by_identifier = {}
+    for payload_content in profiles.values():
+        for payload in payload_content:
+            # First match wins, as it did when exists/item_keys scanned the domains in order.
+            by_identifier.setdefault(payload['ProfileIdentifier'], payload)
+    __context__['profile.items.by_identifier'] = by_identifier
     return profiles
 
 
+def _items_by_identifier():
+    '''
+    Installed profiles from items(), keyed by ProfileIdentifier.
+    '''
+    items()
+    return __context__['profile.items.by_identifier']
+
+
 def exists(identifier):
     '''
     Determine whether a profile with the given identifier is installed.
@@ -396,14 +457,7 @@ def exists(identifier):
 
         salt '*' profiles.installed com.apple.mdm.hostname.local.ABCDEF
     '''
-    profiles = __salt__['profile.items']()
-
-    for domain, payload_content in profiles.items():
-        for payload in payload_content:
-            if payload['ProfileIdentifier'] == identifier:
-                return True
-
-    return False
+    return identifier in _items_by_identifier()
 
 
 def generate(identifier, profile_uuid=None, **kwargs):
@@ -457,41 +511,25 @@ def generate(identifier, profile_uuid=None, **kwargs):
     if not profile_uuid:
         profile_uuid = uuid.uuid4()
 
-    log.debug("Creating new profile with UUID: {}".format(str(profile_uuid)))
-
-    VALID_PROPERTIES = ['description', 'displayname', 'organization', 'content', 'removaldisallowed', 'scope',
-                        'removaldate', 'durationuntilremoval', 'consenttext']
+    log.debug("Creating new profile with UUID: %s", profile_uuid)
 
     log.debug('Looping through kwargs')
-    validkwargs = {k: v for k, v in kwargs.items() if k in VALID_PROPERTIES}
-
     document = {'PayloadScope': 'System', 'PayloadUUID': str(profile_uuid), 'PayloadVersion': 1,
                 'PayloadType': 'Configuration', 'PayloadIdentifier': identifier}
 
-    for k, v in validkwargs.items():
-        if k in ('__id__', 'fun', 'state', '__env__', '__sls__', 'order', 'watch', 'watch_in', 'require',
-                 'require_in', 'prereq', 'prereq_in'):
-            pass
-        elif k == 'content':
+    for k, v in kwargs.items():
+        if k not in VALID_PROPERTIES:
+            continue
+        if k == 'content':
             # As per managedmac for puppet, it's necessary to generate UUIDs for each payload based upon the content
             # in order to detect changes to the payload.
             # Transform a dict of { type: data } to { PayloadContent: data, }
-            payload_content = _transform_content(kwargs['content'], identifier)
-            document['PayloadContent'] = payload_content
-        elif k == 'description':
-            document['PayloadDescription'] = v
-        elif k == 'displayname':
-            document['PayloadDisplayName'] = v
-        elif k == 'organization':
-            document['PayloadOrganization'] = v
-        elif k == 'removaldisallowed':
-            document['PayloadRemovalDisallowed'] = (v is True)
+            document['PayloadContent'] = _transform_content(v, identifier)
+        elif k in _KWARG_KEYS:
+            doc_key, transform = _KWARG_KEYS[k]
+            document[doc_key] = transform(v) if transform else v
 
-    if six.PY3:
-        plist_content = plistlib.dumps(document)
-    else:
-        plist_content = plistlib.writePlistToString(document)
-    return plist_content
+    return _serialize(document)
 
 
 def install(path):
@@ -502,6 +540,8 @@ def install(path):
         Full path to the configuration profile to install
     '''
     status = __salt__['cmd.retcode']('/usr/bin/profiles -I -F {}'.format(path))
+    __context__.pop('profile.items', None)
+    __context__.pop('profile.items.by_identifier', None)
 
     if not status == 0:
         raise salt.exceptions.CommandExecutionError(
@@ -519,6 +559,8 @@ def remove(identifier):
         The ProfileIdentifier
     '''
     status = __salt__['cmd.retcode']('/usr/bin/profiles -R -p {}'.format(identifier))
+    __context__.pop('profile.items', None)
+    __context__.pop('profile.items.by_identifier', None)
 
     if not status == 0:
         raise salt.exceptions.CommandExecutionError(
@@ -528,6 +570,63 @@ def remove(identifier):
     return True
 
 
+def _run_all(func, args):
+    '''
+    Call func (install or remove) for every argument in turn, carrying on past failures. Returns a dict of
+    argument to True, or to the error message if that call failed.
+    '''
+    args = list(args)
+    results = {}
+    for arg in args:
+        try:
+            results[arg] = func(arg)
+        except salt.exceptions.CommandExecutionError as exc:
+            results[arg] = str(exc)
+
+    failed = [arg for arg, result in results.items() if result is not True]
+    if failed:
+        raise salt.exceptions.CommandExecutionError(
+            'Failed for {} of {} profiles: {}'.format(len(failed), len(args), ', '.join(failed)),
+            info=results
+        )
+
+    return results
+
+
+def install_all(paths):
+    '''
+    Install several configuration profiles, one after another. Every profile is attempted even if an earlier one
+    fails, the failures are raised together at the end.
+
+    paths
+        List of full paths to the configuration profiles to install
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' profile.install_all '["/tmp/a.mobileconfig", "/tmp/b.mobileconfig"]'
+    '''
+    return _run_all(install, paths)
+
+
+def remove_all(identifiers):
+    '''
+    Remove several configuration profiles by their profile identifiers, one after another. Every profile is
+    attempted even if an earlier one fails, the failures are raised together at the end.
+
+    identifiers
+        List of ProfileIdentifiers
+
+    CLI Example:
+
+    .. code-block:: bash
+
+        salt '*' profile.remove_all '["com.example.a", "com.example.b"]'
+    '''
+    return _run_all(remove, identifiers)
+
+
 def item_keys(identifier):
     '''
     List all of the keys for an identifier and their values
@@ -541,11 +640,8 @@ def item_keys(identifier):
 
         salt '*' profiles.item_keys com.apple.mdm.hostname.local.ABCDEF
     '''
-    profiles = items()
-
-    for domain, payload_content in profiles.items():
-        for payload in payload_content:
-            if payload['ProfileIdentifier'] == identifier:
-                return payload
-    log.warning('Profile identifier "{}" not found'.format(identifier))
+    payload = _items_by_identifier().get(identifier)
+    if payload is not None:
+        return payload
+    log.warning('Profile identifier "%s" not found', identifier)
     return False
\ No newline at end of file
@@ -20,37 +20,18 @@ log = logging.getLogger(__name__)
 
 __virtualname__ = 'security'
 
+# One "key: value" pair per line of `security find-certificate` output. Lines indented by four spaces are the
+# nested attribute dump and are skipped. The key stops at the first colon.
+_CERT_KV_RE = re.compile(r'^(?![ \t]{4})([^:\n]+):(.*)$', re.M)
+
 
 def __virtual__():
     return __virtualname__ if salt.utils.platform.is_darwin() else False
 
 
-def _parse_attr_line(line):
-    return ('', '')
-
-def _parse_value_line(line):
-    key, value = line.split(':')
-    return key, value
-
-def _parse_cert_line(line):
-    '''Parse attribute line from security stdout'''
-    if re.match('^\s{4}', line):
-        return None, None
-    else:
-        return _parse_value_line(line)
-
-
 def _parse_cert_attributes(stdout):
     '''Parse certificate attributes from stdout of security tool. Assumes SHA-1 hash is included'''
-    outlines = stdout.splitlines()
-    attrs = dict()
-
-    for line in outlines:
-        k, v = _parse_cert_line(line)
-        if k is not None:
-            attrs[k] = v
-
-    return attrs
+    return dict(_CERT_KV_RE.findall(stdout))
 
 def dump_certificate(name):
     '''
@@ -20,10 +20,10 @@ import salt.exceptions
 
 log = logging.getLogger(__name__)
 
-POWER_SOURCES = ['ac', 'battery']  # ups
-VALID_SETTINGS = ['displaysleep', 'disksleep', 'sleep', 'womp', 'ring', 'autorestart', 'lidwake', 'acwake',
-                  'lessbright', 'halfdim', 'sms', 'ttyskeepawake', 'destroyfvkeyonstandby', 'autopoweroff',
-                  'autopoweroffdelay']
+POWER_SOURCES = frozenset(['ac', 'battery'])  # ups
+VALID_SETTINGS = frozenset(['displaysleep', 'disksleep', 'sleep', 'womp', 'ring', 'autorestart', 'lidwake',
+                            'acwake', 'lessbright', 'halfdim', 'sms', 'ttyskeepawake', 'destroyfvkeyonstandby',
+                            'autopoweroff', 'autopoweroffdelay'])
 
 __virtualname__ = 'power'
 
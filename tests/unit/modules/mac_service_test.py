@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+
+ensure_in_syspath('../../../_modules')
+
+import mac_service
+
+LAUNCHCTL_LIST = '''PID\tStatus\tLabel
+-\t0\tcom.apple.SafariHistoryServiceAgent
+417\t0\tcom.apple.Finder
+-\t-9\tcom.apple.progressd
+1234\t0\tcom.apple.xpc.launchd.oneshot.0x10000001.Some App
+88\t0\tcom.apple.trailing.whitespace \t
+'''
+
+
+class LaunchctlListReTestCase(TestCase):
+
+    def test_pid_and_label_columns(self):
+        self.assertEqual(mac_service._LAUNCHCTL_LIST_RE.findall(LAUNCHCTL_LIST), [
+            ('PID', 'Label'),
+            ('-', 'com.apple.SafariHistoryServiceAgent'),
+            ('417', 'com.apple.Finder'),
+            ('-', 'com.apple.progressd'),
+            ('1234', 'com.apple.xpc.launchd.oneshot.0x10000001.Some App'),
+            ('88', 'com.apple.trailing.whitespace'),
+        ])
+
+    def test_header_has_no_pid(self):
+        header = mac_service._LAUNCHCTL_LIST_RE.match(LAUNCHCTL_LIST)
+        self.assertFalse(header.group(1).isdigit())
+
+    def test_lines_do_not_run_into_the_next(self):
+        self.assertEqual(mac_service._LAUNCHCTL_LIST_RE.findall('417\t0\n-\t0\tcom.apple.Finder\n'),
+                         [('-', 'com.apple.Finder')])
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(LaunchctlListReTestCase, needs_daemon=False)
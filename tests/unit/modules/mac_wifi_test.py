@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+
+ensure_in_syspath('../../../_modules')
+
+import mac_wifi
+
+
+class Profile(object):
+    '''
+    Stands in for a CWNetworkProfile, which is only read through ssid() here.
+    '''
+    def __init__(self, ssid):
+        self._ssid = ssid
+
+    def ssid(self):
+        return self._ssid
+
+
+class RemoveTestCase(TestCase):
+
+    def test_removes_adjacent_matches(self):
+        profiles = [Profile('a'), Profile('b'), Profile('b'), Profile('c')]
+        remaining = mac_wifi._remove('b', profiles)
+
+        self.assertEqual([p.ssid() for p in remaining], ['a', 'c'])
+
+    def test_missing_name_keeps_order(self):
+        profiles = [Profile('a'), Profile('b')]
+        remaining = mac_wifi._remove('x', profiles)
+
+        self.assertEqual([p.ssid() for p in remaining], ['a', 'b'])
+
+    def test_does_not_modify_the_given_list(self):
+        profiles = [Profile('a'), Profile('b')]
+        mac_wifi._remove('a', profiles)
+
+        self.assertEqual(len(profiles), 2)
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(RemoveTestCase, needs_daemon=False)
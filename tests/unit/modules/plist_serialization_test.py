@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+# Import Python libs
+import os
+import shutil
+import tempfile
+
+# Import Salt Testing libs
+from salttesting import TestCase, skipIf
+from salttesting.helpers import ensure_in_syspath
+
+ensure_in_syspath('../../../_modules')
+
+import salt.exceptions
+
+import plist_serialization
+
+
+class MutableDict(dict):
+    '''
+    The parts of NSMutableDictionary used by _remove_objects_for_keys, so it can be tested without PyObjC.
+    '''
+    def objectForKey_(self, key):
+        return self.get(key)
+
+    def removeObjectForKey_(self, key):
+        del self[key]
+
+
+class SetObjectsForKeysTestCase(TestCase):
+
+    def test_sets_nested_leaf_without_touching_siblings(self):
+        root = {'a': {'b': 1, 'c': 2}}
+        changed = {}
+        plist_serialization._set_objects_for_keys(root, {'a': {'b': 3}}, changed)
+
+        self.assertEqual(root, {'a': {'b': 3, 'c': 2}})
+        self.assertEqual(changed, {'a': {'b': 3}})
+
+    def test_creates_missing_structure(self):
+        root = {}
+        changed = {}
+        plist_serialization._set_objects_for_keys(root, {'a': {'b': {'c': 'd'}}}, changed)
+
+        self.assertEqual(root, {'a': {'b': {'c': 'd'}}})
+        self.assertEqual(changed, {'a': {'b': {'c': 'd'}}})
+
+    def test_replaces_leaf_with_structure(self):
+        root = {'a': 'string'}
+        plist_serialization._set_objects_for_keys(root, {'a': {'b': 1}})
+
+        self.assertEqual(root, {'a': {'b': 1}})
+
+    def test_unchanged_values_are_not_reported(self):
+        root = {'a': {'b': 1}, 'c': 2}
+        changed = {}
+        plist_serialization._set_objects_for_keys(root, {'a': {'b': 1}, 'c': 2}, changed)
+
+        self.assertEqual(changed, {})
+
+
+class RemoveObjectsForKeysTestCase(TestCase):
+
+    def test_removes_nested_leaf_only(self):
+        root = MutableDict(a=MutableDict(b=1, c=2), d=3)
+        changed = {}
+        plist_serialization._remove_objects_for_keys(root, {'a': {'b': None}}, changed)
+
+        self.assertEqual(root, {'a': {'c': 2}, 'd': 3})
+        self.assertEqual(changed, {'a': {'b': None}})
+
+    def test_missing_keys_are_not_reported(self):
+        root = MutableDict(a=MutableDict(c=2))
+        changed = {}
+        plist_serialization._remove_objects_for_keys(root, {'a': {'b': None}, 'x': None}, changed)
+
+        self.assertEqual(root, {'a': {'c': 2}})
+        self.assertEqual(changed, {})
+
+    def test_does_not_descend_into_non_dictionaries(self):
+        root = MutableDict(a='string')
+        changed = {}
+        plist_serialization._remove_objects_for_keys(root, {'a': {'b': None}}, changed)
+
+        self.assertEqual(root, {'a': 'string'})
+        self.assertEqual(changed, {})
+
+
+class CheckXmlDepthTestCase(TestCase):
+
+    def _nested(self, depth, tag=b'dict'):
+        return b'<plist version="1.0">' + (b'<' + tag + b'>') * depth + (b'</' + tag + b'>') * depth + b'</plist>'
+
+    def test_accepts_depth_at_limit(self):
+        plist_serialization._check_xml_depth(self._nested(plist_serialization._MAX_XML_DEPTH))
+
+    def test_refuses_depth_past_limit(self):
+        with self.assertRaises(salt.exceptions.SaltInvocationError):
+            plist_serialization._check_xml_depth(self._nested(plist_serialization._MAX_XML_DEPTH + 1, b'array'))
+
+    def test_self_closing_tags_do_not_nest(self):
+        contents = b'<plist version="1.0"><array>' + b'<dict/>' * 1000 + b'<array />' * 1000 + b'</array></plist>'
+        plist_serialization._check_xml_depth(contents)
+
+    def test_siblings_do_not_add_depth(self):
+        contents = b'<plist version="1.0"><array>' + b'<dict></dict>' * 1000 + b'</array></plist>'
+        plist_serialization._check_xml_depth(contents)
+
+    def test_binary_is_not_checked(self):
+        plist_serialization._check_xml_depth(b'bplist00' + b'<dict>' * 1000)
+
+
+class ReadPlistNativeTestCase(TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.fallback_calls = []
+        self._read_plist = plist_serialization._read_plist
+        plist_serialization.__context__ = {}
+        plist_serialization._read_plist = self._fallback
+
+    def tearDown(self):
+        plist_serialization._read_plist = self._read_plist
+        shutil.rmtree(self.tmpdir)
+
+    def _fallback(self, filepath, with_format=False, mutable=True):
+        self.fallback_calls.append(filepath)
+        return 'fallback'
+
+    def _write(self, contents):
+        path = os.path.join(self.tmpdir, 'test.plist')
+        with open(path, 'wb') as fh:
+            fh.write(contents)
+        return path
+
+    @skipIf(not plist_serialization.HAS_LIBS, 'The format constants come from PyObjC')
+    def test_reads_xml_with_plistlib(self):
+        path = self._write(b'<?xml version="1.0"?><plist version="1.0"><dict><key>a</key><integer>1</integer>'
+                           b'</dict></plist>')
+
+        self.assertEqual(plist_serialization._read_plist_native(path), {'a': 1})
+        self.assertEqual(self.fallback_calls, [])
+
+    def test_bad_date_falls_back(self):
+        path = self._write(b'<?xml version="1.0"?><plist version="1.0"><date>garbage</date></plist>')
+
+        self.assertEqual(plist_serialization._read_plist_native(path), 'fallback')
+        self.assertEqual(self.fallback_calls, [path])
+
+    def test_old_ascii_format_falls_back(self):
+        path = self._write(b'{ a = 1; }')
+
+        self.assertEqual(plist_serialization._read_plist_native(path), 'fallback')
+        self.assertEqual(self.fallback_calls, [path])
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests([SetObjectsForKeysTestCase, RemoveObjectsForKeysTestCase, CheckXmlDepthTestCase,
+               ReadPlistNativeTestCase], needs_daemon=False)
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+
+ensure_in_syspath('../../../_modules')
+
+import pmset
+
+PMSET_CUSTOM = '''Battery Power:
+ lidwake              1
+ standbydelay         10800
+ autopoweroff         0
+ Sleep On Power Button 1
+ displaysleep         2
+AC Power:
+ lidwake              0
+ displaysleep         10 (sleep prevented by coreaudiod)
+ sleep                1
+'''
+
+
+class ListSettingsTestCase(TestCase):
+
+    def setUp(self):
+        pmset.__salt__ = {'cmd.run': lambda cmd: PMSET_CUSTOM}
+
+    def test_settings_by_power_source(self):
+        self.assertEqual(pmset.list_settings(), {
+            'battery': {
+                'lidwake': True,
+                'standbydelay': '10800',
+                'autopoweroff': False,
+                'displaysleep': '2',
+            },
+            'ac': {
+                'lidwake': False,
+                'sleep': '1',
+            },
+        })
+
+    def test_no_output(self):
+        pmset.__salt__ = {'cmd.run': lambda cmd: ''}
+        self.assertEqual(pmset.list_settings(), None)
+
+
+class PmsetLineReTestCase(TestCase):
+
+    def test_heading(self):
+        self.assertEqual(pmset.PMSET_LINE_RE.findall('AC Power:'), [('AC', '', '')])
+
+    def test_setting(self):
+        self.assertEqual(pmset.PMSET_LINE_RE.findall(' womp  1 '), [('', 'womp', '1')])
+
+    def test_lines_with_more_than_two_fields_are_skipped(self):
+        self.assertEqual(pmset.PMSET_LINE_RE.findall(' Sleep On Power Button 1\n sleep 0 (reason)'), [])
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests([ListSettingsTestCase, PmsetLineReTestCase], needs_daemon=False)
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+# Import Salt Testing libs
+from salttesting import TestCase
+from salttesting.helpers import ensure_in_syspath
+
+ensure_in_syspath('../../../_modules')
+
+import security
+
+FIND_CERTIFICATE = '''SHA-1 hash: 0123456789ABCDEF0123456789ABCDEF01234567
+keychain: "/Library/Keychains/System.keychain"
+version: 256
+class: 0x80001000
+attributes:
+    "alis"<blob>="CA1"
+    "cenc"<uint32>=0x00000003
+    "labl"<blob>="CA1"
+'''
+
+
+class ParseCertAttributesTestCase(TestCase):
+
+    def test_top_level_attributes(self):
+        self.assertEqual(security._parse_cert_attributes(FIND_CERTIFICATE), {
+            'SHA-1 hash': ' 0123456789ABCDEF0123456789ABCDEF01234567',
+            'keychain': ' "/Library/Keychains/System.keychain"',
+            'version': ' 256',
+            'class': ' 0x80001000',
+            'attributes': '',
+        })
+
+    def test_value_with_colon_splits_at_first_colon(self):
+        self.assertEqual(security._parse_cert_attributes('keychain: "C:/x"\n'), {'keychain': ' "C:/x"'})
+
+    def test_lines_without_colon_are_skipped(self):
+        self.assertEqual(security._parse_cert_attributes('no separator\n\n'), {})
+
+
+if __name__ == '__main__':
+    from integration import run_tests
+    run_tests(ParseCertAttributesTestCase, needs_daemon=False)